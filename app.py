@@ -1,13 +1,25 @@
 import os
 import logging
-from flask import Flask, redirect
+from flask import Flask, redirect, flash, request, url_for
+from werkzeug.middleware.proxy_fix import ProxyFix
 from database import db
+from db_pool import engine_options_from_env, pool_monitor
+from audit import audit_log
+from passwords import password_hasher, PasswordHasherBusy
+from ratelimit import rate_limiter
+from compression import init_compression
+from metrics import init_metrics
+from query_budget import query_tracker
+from static_assets import init_static_assets
 from routes.assets import assets_blueprint
 from routes.auth import auth_blueprint
 from routes.dashboard import dashboard_blueprint
 from routes.departments import departments_blueprint
 from routes.users import users_blueprint
 from routes.logs import logs_blueprint
+from routes.api import api_blueprint
+from routes.utils import forget_current_user
+from cache import reference_cache
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -26,8 +38,25 @@ def create_app(config_object=None):
         app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
             "SQLALCHEMY_DATABASE_URI"
         )
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options_from_env(
+            app.config["SQLALCHEMY_DATABASE_URI"]
+        )
+        app.config["PROXY_FIX_X_FOR"] = int(os.getenv("PROXY_FIX_X_FOR", 0))
+
+    # client addresses, which rate limits are keyed on, come from the
+    # X-Forwarded-For entries added by this many proxies in front
+    if app.config.get("PROXY_FIX_X_FOR"):
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"]
+        )
 
     db.init_app(app)
+    pool_monitor.init_app(app)
+    query_tracker.init_app(app)
+    audit_log.init_app(app)
+    password_hasher.init_app(app)
+    rate_limiter.init_app(app)
+    reference_cache.init_app(app)
 
     # register blueprints
     app.register_blueprint(assets_blueprint)
@@ -36,18 +65,27 @@ def create_app(config_object=None):
     app.register_blueprint(departments_blueprint)
     app.register_blueprint(users_blueprint)
     app.register_blueprint(logs_blueprint)
+    app.register_blueprint(api_blueprint)
+
+    app.teardown_request(forget_current_user)
+    init_metrics(app)
+    init_static_assets(app)
+    init_compression(app)
 
     @app.errorhandler(404)
     def page_not_found(e):
         return redirect("/")
 
-    return app
-
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(e):
+        flash("The server is busy, please try again.", "danger")
+        return redirect(request.referrer or url_for('auth.login'))
 
-app = create_app()
+    return app
 
 
 if __name__ == '__main__':
+    # development server only, production runs wsgi:app under gunicorn
     app = create_app()
     host = os.getenv("FLASK_HOST", "127.0.0.1")
     port = int(os.getenv("FLASK_PORT", 5000))
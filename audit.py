@@ -0,0 +1,133 @@
+import atexit
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from database import db
+from models import Log
+from metrics import AUDIT_LOG_WRITTEN, AUDIT_LOG_DROPPED
+
+
+class AuditLogWriter:
+    """Buffers audit log rows in a bounded queue and bulk inserts them from
+    a background thread, so requests don't wait on an audit commit"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.batch_size = 500
+        self.flush_interval = 0.5
+        self.queue_size = 10000
+        self.written = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._pid = None
+        atexit.register(self.stop)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get("AUDIT_LOG_ASYNC", True)
+        self.batch_size = app.config.get("AUDIT_LOG_BATCH_SIZE", 500)
+        self.flush_interval = app.config.get("AUDIT_LOG_FLUSH_INTERVAL", 0.5)
+        self.queue_size = app.config.get("AUDIT_LOG_QUEUE_SIZE", 10000)
+        app.extensions["audit_log"] = self
+
+    def write(self, user_id, action):
+        """Queue a log row, counting it as dropped if the queue is full"""
+        self._ensure_started()
+        row = {
+            "user_id": user_id,
+            "action": action,
+            "timestamp": datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            AUDIT_LOG_DROPPED.inc()
+            with self._lock:
+                self.dropped += 1
+
+    def flush(self):
+        """Insert everything currently queued"""
+        if self._queue is None:
+            return
+        while True:
+            batch = self._take_batch(block=False)
+            if not batch:
+                return
+            self._insert(batch)
+
+    def stop(self, timeout=5):
+        """Stop the background thread and flush what is left"""
+        self._stopping.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+    def _ensure_started(self):
+        # threads don't survive a fork, so each worker process starts its own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._stopping = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="audit-log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._take_batch(block=True)
+            if batch:
+                self._insert(batch)
+
+    def _take_batch(self, block):
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _insert(self, batch):
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(Log), batch)
+                db.session.commit()
+                AUDIT_LOG_WRITTEN.inc(len(batch))
+                with self._lock:
+                    self.written += len(batch)
+            except Exception:
+                db.session.rollback()
+                AUDIT_LOG_DROPPED.inc(len(batch))
+                with self._lock:
+                    self.dropped += len(batch)
+                self.app.logger.exception(
+                    "Failed to write %d audit log rows", len(batch)
+                )
+            finally:
+                db.session.remove()
+
+
+audit_log = AuditLogWriter()
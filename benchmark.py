@@ -0,0 +1,253 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.cookiejar import CookieJar
+from sqlalchemy import func
+from database import db
+from models import User, Asset, Log
+
+# HTTP load benchmark: seeds a large database, drives each endpoint with
+# concurrent workers and writes p50/p95/p99 latency and throughput to JSON,
+# optionally failing if they regressed against a saved baseline
+
+ENDPOINTS = [
+    "/dashboard",
+    "/assets",
+    "/assets?sort=name&order=desc",
+    "/assets?q=laptop",
+    "/logs",
+    "/api/v1/assets",
+    "/api/v1/users",
+]
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of already sorted samples"""
+    if not samples:
+        return 0.0
+    rank = math.ceil(fraction * len(samples))
+    return samples[max(0, min(len(samples), rank) - 1)]
+
+
+def summarise(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+class TestClientDriver:
+    """Requests through Flask's test client, one client per thread
+    sharing the admin's session cookie"""
+
+    def __init__(self, app, username, password):
+        self.app = app
+        self.local = threading.local()
+        client = app.test_client()
+        client.post("/login", data={
+            "username": username, "password": password
+        })
+        self.cookie = client.get_cookie("session").value
+
+    def get(self, path):
+        if not hasattr(self.local, "client"):
+            self.local.client = self.app.test_client()
+            self.local.client.set_cookie("session", self.cookie)
+        response = self.local.client.get(path)
+        response.close()
+        return response.status_code
+
+
+class ServerDriver:
+    """Requests against a running server, logged in once as admin"""
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip("/")
+        cookies = CookieJar()
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(cookies)
+        )
+        opener.open(self.base_url + "/login", urllib.parse.urlencode({
+            "username": username, "password": password
+        }).encode())
+        self.cookie = "; ".join(
+            f"{cookie.name}={cookie.value}" for cookie in cookies
+        )
+
+    def get(self, path):
+        request = urllib.request.Request(
+            self.base_url + path, headers={"Cookie": self.cookie}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:  # nosec
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+
+def run_endpoint(driver, path, requests, concurrency, warmup=5):
+    for _ in range(warmup):
+        driver.get(path)
+
+    def timed(_):
+        started = time.perf_counter()
+        status = driver.get(path)
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+    # a redirect means the session was lost, so it counts as an error
+    latencies = [
+        latency for latency, status in results
+        if status < 300 or status == 304
+    ]
+    return summarise(latencies, len(results) - len(latencies), elapsed)
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of p95 latency or throughput beyond tolerance, a
+    fraction of the baseline value"""
+    regressions = []
+    for path, current in results.items():
+        previous = baseline.get(path)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{path}: p95 {previous['p95_ms']}ms -> "
+                f"{current['p95_ms']}ms"
+            )
+        if current["throughput_rps"] < \
+                previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{path}: throughput {previous['throughput_rps']}/s -> "
+                f"{current['throughput_rps']}/s"
+            )
+        if current["errors"] > previous["errors"]:
+            regressions.append(
+                f"{path}: errors {previous['errors']} -> {current['errors']}"
+            )
+    return regressions
+
+
+class BenchmarkConfig:
+    TESTING = False
+    AUDIT_LOG_ASYNC = True
+    PASSWORD_HASH_WORKERS = 0
+    RATE_LIMIT_ENABLED = False
+
+
+def main():
+    from app import create_app
+    from db_pool import engine_options_from_env
+    from setup_db import generate_data
+
+    parser = argparse.ArgumentParser(description="HTTP load benchmark")
+    parser.add_argument("--database", default="sqlite:///benchmark.db",
+                        help="database to seed and run against")
+    parser.add_argument("--server", default=None,
+                        help="benchmark a running server at this URL "
+                             "instead of the test client")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--assets", type=int, default=50000)
+    parser.add_argument("--logs", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reseed", action="store_true",
+                        help="drop and seed the database even if it has "
+                             "data")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoint", action="append", default=None,
+                        help="endpoint to benchmark, may be repeated")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", default=None,
+                        help="fail if results regressed against this file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    config = BenchmarkConfig()
+    config.SQLALCHEMY_DATABASE_URI = args.database
+    config.SQLALCHEMY_ENGINE_OPTIONS = engine_options_from_env(args.database)
+    app = create_app(config)
+
+    with app.app_context():
+        if args.reseed:
+            db.drop_all()
+        db.create_all()
+        if not db.session.query(func.count(Asset.id)).scalar():
+            print(f"Seeding {args.users} users, {args.assets} assets and "
+                  f"{args.logs} logs")
+            generate_data(
+                args.users, args.assets, args.logs, args.seed,
+                until=datetime(2025, 1, 1)
+            )
+        dialect = db.engine.dialect.name
+        dataset = {
+            "users": db.session.query(func.count(User.id)).scalar(),
+            "assets": db.session.query(func.count(Asset.id)).scalar(),
+            "logs": db.session.query(func.count(Log.id)).scalar(),
+        }
+
+    if args.server:
+        driver = ServerDriver(args.server, "admin", "password")
+    else:
+        driver = TestClientDriver(app, "admin", "password")
+
+    results = {}
+    for path in args.endpoint or ENDPOINTS:
+        results[path] = run_endpoint(
+            driver, path, args.requests, args.concurrency
+        )
+        print(f"{path:35} " + "  ".join(
+            f"{key} {value}" for key, value in results[path].items()
+        ))
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "target": args.server or "test client",
+            "database": None if args.server else dialect,
+            "dataset": dataset,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(
+                results, json.load(baseline)["results"], args.tolerance
+            )
+        for regression in regressions:
+            print(f"Regression {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
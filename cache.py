@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import CacheVersion
+
+
+class TTLCache:
+    """Thread safe in-process cache whose entries expire after ttl seconds,
+    routes that change the underlying data invalidate it explicitly"""
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader, ttl=None):
+        """Return the cached value for key, calling loader on a miss"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+
+        value = loader()
+        if ttl > 0:
+            with self._lock:
+                self._entries[key] = (now + ttl, value)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything if no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class VersionedCache:
+    """Bounded LRU cache for reference data such as departments and the
+    user directory. Entries are keyed by their entity's version in
+    cache_versions, which routes bump when they change that entity. Each
+    process re-reads the versions at most every check_interval seconds,
+    so another worker's change is seen within that time and never served
+    stale after it."""
+
+    def __init__(self, max_entries=256, check_interval=1.0):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.get("REFERENCE_CACHE_SIZE", 256)
+        self.check_interval = app.config.get(
+            "REFERENCE_CACHE_CHECK_INTERVAL", 1.0
+        )
+        self.clear()
+        app.extensions["reference_cache"] = self
+
+    def version(self, entity):
+        now = time.monotonic()
+        if self._checked is None or now - self._checked >= self.check_interval:
+            versions = dict(db.session.query(
+                CacheVersion.entity, CacheVersion.version
+            ))
+            with self._lock:
+                self._versions = versions
+                self._checked = now
+        return self._versions.get(entity, 0)
+
+    def get(self, entity, key, loader):
+        """The cached value of key for entity's current version, calling
+        loader on a miss"""
+        cache_key = (entity, self.version(entity), key)
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return self._entries[cache_key]
+            self.misses += 1
+
+        value = loader()
+        with self._lock:
+            self._entries[cache_key] = value
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def stamp(self, *entities):
+        """The versions of entities read straight from the database, a
+        cheap validator for responses built from them"""
+        versions = dict(db.session.query(
+            CacheVersion.entity, CacheVersion.version
+        ).filter(CacheVersion.entity.in_(entities)))
+        return tuple(versions.get(entity, 0) for entity in entities)
+
+    def bump(self, *entities):
+        """Mark entities as changed, for this process and every other"""
+        for entity in entities:
+            updated = db.session.execute(
+                update(CacheVersion)
+                .where(CacheVersion.entity == entity)
+                .values(version=CacheVersion.version + 1)
+            ).rowcount
+            if not updated:
+                db.session.add(CacheVersion(entity=entity, version=1))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # another process created the row first
+                db.session.rollback()
+                self.bump(entity)
+        with self._lock:
+            self._checked = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions = {}
+            self._checked = None
+
+
+# dashboard counters, invalidated by any route that adds or removes assets,
+# users or departments or changes an asset's approval
+metrics_cache = TTLCache()
+
+# user column snapshots keyed by id, off unless IDENTITY_CACHE_TTL is set,
+# invalidated by the routes that edit, promote or delete a user
+identity_cache = TTLCache(ttl=0)
+
+# departments and the user directory, bumped by the routes that create,
+# edit or delete either. Asset routes bump assets too, which only the API's
+# ETags use
+reference_cache = VersionedCache()
@@ -0,0 +1,64 @@
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# compresses text responses for clients that accept it, brotli when it is
+# installed and gzip otherwise
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html", "text/css", "text/csv", "text/plain",
+    "application/json", "application/javascript", "application/x-ndjson",
+}
+
+
+def choose_encoding(accept_encoding):
+    # by quality, an encoding listed with q=0 is one the client refuses
+    if brotli is not None and accept_encoding["br"] > 0:
+        return "br"
+    if accept_encoding["gzip"] > 0:
+        return "gzip"
+    return None
+
+
+def compress_response(response, min_size, level):
+    """Compress a buffered response in place if it is worth it"""
+    if (
+        response.status_code < 200
+        or response.status_code == 204
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    data = response.get_data()
+    if encoding is None or len(data) < min_size:
+        return response
+
+    if encoding == "br":
+        data = brotli.compress(data, quality=min(level, 11))
+    else:
+        data = gzip.compress(data, compresslevel=level)
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    # the compressed body is a different representation of the same data
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    min_size = app.config.get("COMPRESS_MIN_SIZE", 500)
+    level = app.config.get("COMPRESS_LEVEL", 6)
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, min_size, level)
@@ -1,2 +1,29 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
 db = SQLAlchemy()
+
+
+class code_point_order(ColumnElement):
+    """An expression compared by code point, COLLATE "C" on Postgres whose
+    default locale collations order punctuation differently. SQLite's
+    default BINARY collation already does."""
+
+    inherit_cache = True
+    _traverse_internals = [("clause", InternalTraversal.dp_clauseelement)]
+
+    def __init__(self, clause):
+        self.clause = clause
+        self.type = clause.type
+
+
+@compiles(code_point_order)
+def compile_code_point_order(element, compiler, **kw):
+    return compiler.process(element.clause, **kw)
+
+
+@compiles(code_point_order, "postgresql")
+def compile_code_point_order_postgresql(element, compiler, **kw):
+    return f'{compiler.process(element.clause, **kw)} COLLATE "C"'
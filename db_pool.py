@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+from database import db
+from metrics import (
+    POOL_SIZE, POOL_CHECKED_OUT, POOL_OVERFLOW, POOL_WAIT, POOL_TIMEOUTS
+)
+
+# environment variable -> (engine option, type)
+POOL_SETTINGS = {
+    "DB_POOL_SIZE": ("pool_size", int),
+    "DB_MAX_OVERFLOW": ("max_overflow", int),
+    # engine_from_config makes this a whole number of seconds anyway
+    "DB_POOL_TIMEOUT": ("pool_timeout", int),
+}
+
+
+def engine_options_from_env(uri, environ=os.environ):
+    """SQLALCHEMY_ENGINE_OPTIONS for uri from DB_POOL_* variables, pool
+    sizing is left to SQLAlchemy's defaults unless set"""
+    options = {
+        "pool_pre_ping": environ.get("DB_POOL_PRE_PING", "1") == "1",
+        "pool_recycle": int(environ.get("DB_POOL_RECYCLE", 1800)),
+    }
+    url = make_url(uri)
+    # in-memory SQLite always gets a single static connection
+    in_memory = url.database in (None, "", ":memory:")
+    if url.get_backend_name() == "sqlite" and in_memory:
+        return options
+
+    options["poolclass"] = TimedQueuePool
+    for name, (option, convert) in POOL_SETTINGS.items():
+        if environ.get(name):
+            options[option] = convert(environ[name])
+    return options
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a
+    connection, and its occupancy after every checkout and return, to
+    pool_monitor"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except TimeoutError:
+            pool_monitor.record_wait(time.perf_counter() - started, True)
+            raise
+        pool_monitor.record_wait(time.perf_counter() - started)
+        pool_monitor.record_usage(self)
+        return record
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        pool_monitor.record_usage(self)
+
+
+class PoolMonitor:
+    """Counts connection pool events for this process, and exports
+    occupancy and wait times as metrics summed across workers, so the pool
+    can be sized against the database's max_connections from real
+    numbers"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._listeners = {
+            name: self._counter(name)
+            for name in ("connect", "checkout", "checkin", "invalidate")
+        }
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        with app.app_context():
+            engine = db.engine
+        for name, listener in self._listeners.items():
+            if not event.contains(engine, name, listener):
+                event.listen(engine, name, listener)
+        app.extensions["pool_monitor"] = self
+
+    def reset(self):
+        with self._lock:
+            self.events = {
+                "connect": 0, "checkout": 0, "checkin": 0, "invalidate": 0
+            }
+            self.waits = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.timeouts = 0
+
+    def record_wait(self, seconds, timed_out=False):
+        POOL_WAIT.observe(seconds)
+        if timed_out:
+            POOL_TIMEOUTS.inc()
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def record_usage(self, pool):
+        POOL_SIZE.set(pool.size())
+        POOL_CHECKED_OUT.set(pool.checkedout())
+        POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    def stats(self):
+        """Pool occupancy right now plus counters since the last reset"""
+        stats = {}
+        if self.app is not None:
+            with self.app.app_context():
+                pool = db.engine.pool
+            for name in ("size", "checkedout", "overflow", "checkedin"):
+                if hasattr(pool, name):
+                    stats[name] = getattr(pool, name)()
+        with self._lock:
+            stats.update(self.events)
+            stats.update(
+                waits=self.waits,
+                wait_seconds=round(self.wait_seconds, 6),
+                average_wait_seconds=round(
+                    self.wait_seconds / self.waits if self.waits else 0, 6
+                ),
+                max_wait_seconds=round(self.max_wait_seconds, 6),
+                timeouts=self.timeouts,
+            )
+        return stats
+
+    def _counter(self, name):
+        def count(*args):
+            with self._lock:
+                self.events[name] += 1
+        return count
+
+
+pool_monitor = PoolMonitor()
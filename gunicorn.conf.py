@@ -0,0 +1,71 @@
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+# every setting can be overridden from the environment
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# a few processes per core for the CPU bound work, threads in each for
+# requests waiting on the database
+workers = int(os.getenv(
+    "GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1
+))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+
+# build the app once in the master and fork it
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# recycle workers now and then so slow leaks can't build up
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# workers write their metrics here and /metrics adds them up. It has to
+# exist before the app, and prometheus_client with it, is imported, which
+# preload_app does before any server hook runs
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "itam-metrics")
+)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+# samples left by a previous run would be added to this one's
+for path in glob.glob(
+    os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")
+):
+    os.remove(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # connections opened in the master must not be shared with workers
+    if preload_app:
+        from wsgi import app
+        from database import db
+
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    from audit import audit_log
+    from passwords import password_hasher
+
+    # write out audit rows still queued in this worker
+    audit_log.stop()
+    password_hasher.shutdown()
@@ -0,0 +1,146 @@
+import hmac
+import os
+import time
+from flask import g, request, abort
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from query_budget import query_tracker
+
+# per-endpoint request metrics in Prometheus text format on /metrics, when
+# PROMETHEUS_MULTIPROC_DIR is set every worker process writes its samples
+# there and /metrics adds them up
+
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+REQUESTS = Counter(
+    "itam_http_requests_total", "Requests handled",
+    ["method", "endpoint", "status"]
+)
+LATENCY = Histogram(
+    "itam_http_request_duration_seconds",
+    "Time to produce a response, not including streaming its body",
+    ["method", "endpoint"]
+)
+RESPONSE_SIZE = Histogram(
+    "itam_http_response_size_bytes",
+    "Size of responses whose length is known, after compression",
+    ["endpoint"], buckets=SIZE_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    "itam_http_requests_in_flight", "Requests being handled",
+    ["endpoint"], multiprocess_mode="livesum"
+)
+DB_TIME = Histogram(
+    "itam_db_query_duration_seconds",
+    "Time spent in database queries per request", ["endpoint"]
+)
+DB_QUERIES = Histogram(
+    "itam_db_queries_per_request", "Database queries per request",
+    ["endpoint"], buckets=QUERY_BUCKETS
+)
+# connection pool state, each worker's gauges are added up so they show
+# the connections the whole deployment holds against max_connections
+POOL_SIZE = Gauge(
+    "itam_db_pool_size", "Connections each pool keeps open",
+    multiprocess_mode="livesum"
+)
+POOL_CHECKED_OUT = Gauge(
+    "itam_db_pool_checked_out", "Connections in use",
+    multiprocess_mode="livesum"
+)
+POOL_OVERFLOW = Gauge(
+    "itam_db_pool_overflow", "Connections open beyond the pool size",
+    multiprocess_mode="livesum"
+)
+POOL_WAIT = Histogram(
+    "itam_db_pool_wait_seconds", "Time checkouts waited for a connection"
+)
+POOL_TIMEOUTS = Counter(
+    "itam_db_pool_timeouts_total",
+    "Checkouts that gave up waiting for a connection"
+)
+AUDIT_LOG_WRITTEN = Counter(
+    "itam_audit_log_written_total", "Audit log rows written in the background"
+)
+AUDIT_LOG_DROPPED = Counter(
+    "itam_audit_log_dropped_total",
+    "Audit log rows lost to a full queue or a failed insert"
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "itam_rate_limit_rejections_total",
+    "Attempts turned away by a rate limit", ["rule"]
+)
+
+
+def endpoint_label():
+    return request.endpoint or "unmatched"
+
+
+def start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_endpoint = endpoint_label()
+    IN_FLIGHT.labels(g.metrics_endpoint).inc()
+
+
+def record_response(response):
+    if "metrics_started" in g:
+        g.metrics_status = response.status_code
+        if response.content_length is not None:
+            RESPONSE_SIZE.labels(g.metrics_endpoint).observe(
+                response.content_length
+            )
+    return response
+
+
+def finish_request(exc=None):
+    if "metrics_started" not in g:
+        return
+    endpoint = g.pop("metrics_endpoint")
+    elapsed = time.perf_counter() - g.pop("metrics_started")
+    status = g.pop("metrics_status", 500)
+    IN_FLIGHT.labels(endpoint).dec()
+    REQUESTS.labels(request.method, endpoint, str(status)).inc()
+    LATENCY.labels(request.method, endpoint).observe(elapsed)
+    queries, seconds = query_tracker.current()
+    DB_TIME.labels(endpoint).observe(seconds)
+    DB_QUERIES.labels(endpoint).observe(queries)
+
+
+def metrics_registry():
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics():
+    token = os.getenv("METRICS_TOKEN")
+    if token and not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        abort(401)
+    return generate_latest(metrics_registry()), 200, {
+        "Content-Type": CONTENT_TYPE_LATEST
+    }
+
+
+def init_metrics(app):
+    """Instrument every request and serve /metrics, register before other
+    after_request hooks so sizes are measured after compression. Database
+    counts come from query_tracker, which must be set up on app first."""
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    app.add_url_rule("/metrics", "metrics", metrics)
+
+    @app.before_request
+    def start_metrics():
+        if request.endpoint != "metrics":
+            start_request()
+
+    app.after_request(record_response)
+    app.teardown_request(finish_request)
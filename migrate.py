@@ -0,0 +1,174 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from app import create_app
+from database import db
+from models import CacheVersion
+from search import create_search_index, rebuild_search_index
+
+# brings an existing database up to date with indexes declared on the models
+# without locking writes, CREATE INDEX CONCURRENTLY on Postgres
+
+INVALID_INDEXES = """
+    SELECT c.relname, c.relkind
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE NOT i.indisvalid
+"""
+
+# indexes the models no longer declare, replaced by ones that order by code
+# point as prefix searches need
+OBSOLETE_INDEXES = ["ix_users_username_lower", "ix_departments_name_lower"]
+
+PARTITIONS = """
+    SELECT c.relname
+    FROM pg_partitioned_table pt
+    JOIN pg_inherits i ON i.inhparent = pt.partrelid
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = pt.partrelid
+    WHERE p.relname = :table
+    ORDER BY c.relname
+"""
+
+
+def drop_invalid_indexes(connection, names):
+    """Drop indexes left invalid by an interrupted concurrent build"""
+    invalid = dict(connection.exec_driver_sql(INVALID_INDEXES).all())
+    for name in sorted(invalid.keys() & names):
+        print(f"Dropping invalid index {name}")
+        # a partitioned table's own index can't be dropped concurrently
+        concurrently = "" if invalid[name] == "I" else " CONCURRENTLY"
+        connection.exec_driver_sql(f'DROP INDEX{concurrently} "{name}"')
+
+
+def index_names(connection, inspector, table_name):
+    # SQLite reflection skips expression indexes, its catalogue doesn't
+    if connection.dialect.name == "sqlite":
+        return {
+            name for (name,) in connection.execute(text(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'index' AND tbl_name = :table"
+            ), {"table": table_name})
+        }
+    return {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def missing_indexes(connection):
+    """Indexes declared on the models that the database doesn't have"""
+    inspector = inspect(connection)
+    for table in db.metadata.sorted_tables:
+        existing = index_names(connection, inspector, table.name)
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                yield index
+
+
+def table_partitions(connection, table_name):
+    """Names of the partitions of a partitioned Postgres table"""
+    return [
+        name for (name,) in
+        connection.execute(text(PARTITIONS), {"table": table_name})
+    ]
+
+
+def partition_index_name(index, partition):
+    return f"{partition}_{index.name}"[:63]
+
+
+def partitioned_index_statements(index, partitions, dialect):
+    """Build index on a partitioned table without locking writes, each
+    partition concurrently, then the parent ON ONLY with the partitions'
+    indexes attached, since Postgres can't build it concurrently itself"""
+    quote = dialect.identifier_preparer.quote
+    table = dialect.identifier_preparer.format_table(index.table)
+    parent = str(
+        CreateIndex(index, if_not_exists=True).compile(dialect=dialect)
+    )
+    head, definition = parent.split(f" ON {table} ", 1)
+    unique = "UNIQUE " if index.unique else ""
+
+    statements = [
+        f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS "
+        f"{quote(partition_index_name(index, partition))} "
+        f"ON {quote(partition)} {definition}"
+        for partition in partitions
+    ]
+    statements.append(f"{head} ON ONLY {table} {definition}")
+    statements.extend(
+        f"ALTER INDEX {quote(index.name)} ATTACH PARTITION "
+        f"{quote(partition_index_name(index, partition))}"
+        for partition in partitions
+    )
+    return statements
+
+
+def create_index(connection, index, postgres):
+    partitions = table_partitions(connection, index.table.name) \
+        if postgres else []
+    if not partitions:
+        options = index.dialect_options["postgresql"]
+        options["concurrently"] = postgres
+        try:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+        finally:
+            options["concurrently"] = False
+        return
+
+    drop_invalid_indexes(connection, {
+        partition_index_name(index, partition) for partition in partitions
+    })
+    for statement in partitioned_index_statements(
+        index, partitions, connection.dialect
+    ):
+        connection.exec_driver_sql(statement)
+
+
+def migrate_indexes(engine):
+    """Create every missing model index, returns their names"""
+    postgres = engine.dialect.name == "postgresql"
+    created = []
+    # concurrent builds can't run inside a transaction
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as connection:
+        if postgres:
+            drop_invalid_indexes(connection, {
+                index.name
+                for table in db.metadata.sorted_tables
+                for index in table.indexes
+            })
+        for index in list(missing_indexes(connection)):
+            print(f"Creating index {index.name}")
+            create_index(connection, index, postgres)
+            created.append(index.name)
+        # only once their replacements exist
+        concurrently = " CONCURRENTLY" if postgres else ""
+        for name in OBSOLETE_INDEXES:
+            connection.exec_driver_sql(
+                f'DROP INDEX{concurrently} IF EXISTS "{name}"'
+            )
+    return created
+
+
+def migrate_search_index(engine):
+    """Create and fill the asset search index if it doesn't exist yet"""
+    if inspect(engine).has_table("asset_search"):
+        return False
+    print("Creating asset search index")
+    with engine.begin() as connection:
+        create_search_index(db.metadata, connection)
+    rebuild_search_index()
+    return True
+
+
+def migrate():
+    app = create_app()
+
+    with app.app_context():
+        CacheVersion.__table__.create(db.engine, checkfirst=True)
+        migrate_indexes(db.engine)
+        migrate_search_index(db.engine)
+        print("Database migration successful")
+
+
+if __name__ == '__main__':
+    migrate()
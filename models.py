@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 
 from sqlalchemy import func
-from database import db
+from database import db, code_point_order
 
 
 class User(db.Model):
@@ -26,8 +26,18 @@ class User(db.Model):
         return f"<User {self.username} ({self.role})>"
 
 
+# case insensitive prefix search for the owner picker, in the code point
+# order prefix_filter's range assumes
+db.Index(
+    "ix_users_username_prefix", code_point_order(func.lower(User.username))
+)
+
+
 class Department(db.Model):
     __tablename__ = "departments"
+    __table_args__ = (
+        db.Index("ix_departments_name", "name"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, index=True)
     name = db.Column(db.String(100), nullable=False)
@@ -42,8 +52,23 @@ class Department(db.Model):
         return f"<Department {self.name}>"
 
 
+db.Index(
+    "ix_departments_name_prefix", code_point_order(func.lower(Department.name))
+)
+
+
 class Asset(db.Model):
     __tablename__ = "assets"
+    __table_args__ = (
+        # dashboard pending queue, all or per owner
+        db.Index("ix_assets_approved_owner_id", "approved", "owner_id"),
+        # assets listing, newest first, all or per owner
+        db.Index("ix_assets_date_created", "date_created"),
+        db.Index(
+            "ix_assets_owner_id_date_created", "owner_id", "date_created"
+        ),
+        db.Index("ix_assets_department_id", "department_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, index=True)
     name = db.Column(db.String(150), nullable=False)
@@ -79,8 +104,24 @@ class Asset(db.Model):
         return f"<Asset {self.name} ({self.type})>"
 
 
+class CacheVersion(db.Model):
+    """Version stamp per cached entity, bumped on every change so each
+    worker process can tell its cached copy is stale"""
+    __tablename__ = "cache_versions"
+
+    entity = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CacheVersion {self.entity} v{self.version}>"
+
+
 class Log(db.Model):
     __tablename__ = "logs"
+    __table_args__ = (
+        db.Index("ix_logs_timestamp", "timestamp"),
+        db.Index("ix_logs_user_id_timestamp", "user_id", "timestamp"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
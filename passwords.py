@@ -0,0 +1,111 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from werkzeug.security import (
+    generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+)
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes are already waiting for a worker"""
+
+
+def hash_prefix(method):
+    """The method and parameters werkzeug writes at the start of a hash
+    made with method, filling in its defaults without hashing anything"""
+    name, *args = method.split(":")
+    if name == "scrypt":
+        n, r, p = args or (2 ** 15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    if name == "pbkdf2":
+        hash_name = args[0] if args else "sha256"
+        iterations = args[1] if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Invalid hash method '{method}'.")
+
+
+def pool_context():
+    """Start hashing processes from a clean server process rather than by
+    forking a worker whose other threads may be holding locks"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+class PasswordHasher:
+    """Runs password hashing in a bounded process pool so it doesn't hold
+    the GIL in request threads, and knows when a stored hash should be
+    upgraded to the configured method"""
+
+    def __init__(self, app=None):
+        self.method = "scrypt"
+        self.workers = 0
+        self.max_pending = 64
+        self.timeout = 10
+        self._prefix = None
+        self._pool = None
+        self._pid = None
+        self._pending = None
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get("PASSWORD_HASH_METHOD", "scrypt")
+        # per gunicorn worker, which already run a couple per core, so one
+        # each keeps hashing to about one process per core on the host
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", 1)
+        self.max_pending = app.config.get("PASSWORD_HASH_MAX_PENDING", 64)
+        self.timeout = app.config.get("PASSWORD_HASH_TIMEOUT", 10)
+        self._prefix = None
+        self.shutdown()
+        app.extensions["password_hasher"] = self
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a hash was made with a different method or cost"""
+        if self._prefix is None:
+            self._prefix = hash_prefix(self.method)
+        return password_hash.split("$", 1)[0] != self._prefix
+
+    def shutdown(self):
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+
+        pool, pending = self._ensure_pool()
+        if not pending.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy()
+        try:
+            return pool.submit(function, *args).result(self.timeout)
+        except TimeoutError:
+            raise PasswordHasherBusy()
+        finally:
+            pending.release()
+
+    def _ensure_pool(self):
+        # a pool inherited through fork is unusable, each worker makes its own
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=pool_context()
+                )
+                self._pending = threading.BoundedSemaphore(self.max_pending)
+                self._pid = os.getpid()
+            return self._pool, self._pending
+
+
+password_hasher = PasswordHasher()
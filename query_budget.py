@@ -0,0 +1,111 @@
+import re
+import time
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from database import db
+
+# per-request query counting and timing, warns when an endpoint runs more
+# queries than its budget or the same statement over and over, the usual
+# sign of a relationship being loaded once per row. metrics.py reports the
+# same counts rather than listening for them again
+
+LITERAL_REGEX = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# qmark, format, named, numeric and pyformat (psycopg) placeholders
+PARAMETER_LIST_REGEX = re.compile(
+    r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)\s*,?)+\)"
+)
+WHITESPACE_REGEX = re.compile(r"\s+")
+
+
+def fingerprint(statement):
+    """A statement with its literals and parameter lists made generic, so
+    repeats of one query with different values look the same"""
+    statement = LITERAL_REGEX.sub("?", statement)
+    statement = PARAMETER_LIST_REGEX.sub("(?)", statement)
+    return WHITESPACE_REGEX.sub(" ", statement).strip()
+
+
+class QueryTracker:
+    """Counts, times and fingerprints the statements each request runs.
+    Unless QUERY_TRACKING is off, logs a warning when an endpoint goes over
+    QUERY_BUDGET (or its entry in QUERY_BUDGETS) or repeats one fingerprint
+    QUERY_REPEAT_LIMIT times. Functions in reporters are called with every
+    request's report."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.budget = 50
+        self.budgets = {}
+        self.repeat_limit = 10
+        self.reporters = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get("QUERY_TRACKING", True)
+        self.budget = app.config.get("QUERY_BUDGET", 50)
+        self.budgets = app.config.get("QUERY_BUDGETS", {})
+        self.repeat_limit = app.config.get("QUERY_REPEAT_LIMIT", 10)
+        with app.app_context():
+            engine = db.engine
+        if not event.contains(engine, "after_cursor_execute", self._record):
+            event.listen(engine, "before_cursor_execute", self._started)
+            event.listen(engine, "after_cursor_execute", self._record)
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+        app.extensions["query_tracker"] = self
+
+    def current(self):
+        """(queries, seconds spent in them) for the request so far"""
+        return g.get("query_count", 0), g.get("query_seconds", 0.0)
+
+    def _start(self):
+        g.query_fingerprints = Counter()
+        g.query_count = 0
+        g.query_seconds = 0.0
+
+    def _started(self, conn, cursor, statement, parameters, context,
+                 executemany):
+        context.query_started = time.perf_counter()
+
+    def _record(self, conn, cursor, statement, parameters, context,
+                executemany):
+        # background work such as the audit log writer has no request
+        if has_request_context() and "query_fingerprints" in g:
+            g.query_fingerprints[fingerprint(statement)] += 1
+            g.query_count += 1
+            g.query_seconds += time.perf_counter() - context.query_started
+
+    def _finish(self, exc=None):
+        # left in g for the other teardown hooks, _start resets them
+        fingerprints = g.get("query_fingerprints")
+        if fingerprints is None or not self.enabled:
+            return
+        report = {
+            "endpoint": request.endpoint,
+            "queries": g.query_count,
+            "fingerprints": fingerprints,
+        }
+
+        budget = self.budgets.get(request.endpoint, self.budget)
+        if report["queries"] > budget:
+            self.app.logger.warning(
+                "%s ran %d queries, over its budget of %d",
+                request.endpoint, report["queries"], budget
+            )
+        for statement, count in fingerprints.most_common():
+            if count < self.repeat_limit:
+                break
+            self.app.logger.warning(
+                "%s ran the same query %d times, likely N+1: %s",
+                request.endpoint, count, statement
+            )
+
+        for reporter in self.reporters:
+            reporter(report)
+
+
+query_tracker = QueryTracker()
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+from metrics import RATE_LIMIT_REJECTIONS
+
+
+class MemoryBucketStore:
+    """Token buckets held in this process, the least recently used are
+    forgotten once there are more than max_keys of them"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_per_second, cost=1):
+        """Take cost tokens from key's bucket, False if there aren't
+        enough"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(
+                capacity, tokens + (now - updated) * refill_per_second
+            )
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RateLimiter:
+    """Admission control for expensive endpoints. Each rule is a bucket of
+    `capacity` attempts refilled over `period` seconds, checked per key
+    (an IP address or username) before any work is done. Another store
+    with the same consume() signature can be swapped in to share buckets
+    between processes."""
+
+    DEFAULT_RULES = {
+        "login_ip": (20, 60),
+        "login_username": (5, 60),
+        "register_ip": (5, 300),
+    }
+
+    def __init__(self, app=None, store=None):
+        self.enabled = True
+        self.rules = dict(self.DEFAULT_RULES)
+        self.store = store or MemoryBucketStore()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("RATE_LIMIT_ENABLED", True)
+        self.rules = dict(self.DEFAULT_RULES)
+        self.rules.update(app.config.get("RATE_LIMIT_RULES", {}))
+        if app.config.get("RATE_LIMIT_STORE") is not None:
+            self.store = app.config["RATE_LIMIT_STORE"]
+        app.extensions["rate_limiter"] = self
+
+    def allow(self, rule, key):
+        """Whether an attempt for key is admitted under rule"""
+        if not self.enabled or key is None:
+            return True
+        capacity, period = self.rules[rule]
+        allowed = self.store.consume(
+            f"{rule}:{key}", capacity, capacity / period
+        )
+        if not allowed:
+            RATE_LIMIT_REJECTIONS.labels(rule).inc()
+        return allowed
+
+
+rate_limiter = RateLimiter()
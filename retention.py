@@ -0,0 +1,299 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from database import db
+from models import Log
+
+# audit log retention, monthly range partitions of logs on Postgres and
+# gzipped NDJSON archives of months older than the retention window
+
+DEFAULT_ARCHIVE_DIR = os.path.join("archive", "logs")
+ARCHIVE_COLUMNS = ["id", "user_id", "action", "timestamp"]
+
+IS_PARTITIONED = """
+    SELECT 1 FROM pg_partitioned_table pt
+    JOIN pg_class c ON c.oid = pt.partrelid
+    WHERE c.relname = 'logs'
+"""
+
+HAS_PARTITION = """
+    SELECT 1 FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname = 'logs' AND c.relname = :name
+"""
+
+# proves the existing table fits its partition bound ahead of the attach,
+# validating takes a lock that doesn't block writes, so ATTACH PARTITION
+# can skip its own scan under an exclusive lock
+BOUND_LOGS = [
+    # left behind if an earlier conversion stopped part way
+    "ALTER TABLE logs DROP CONSTRAINT IF EXISTS logs_partition_bound",
+    "ALTER TABLE logs ADD CONSTRAINT logs_partition_bound "
+    "CHECK (timestamp IS NOT NULL AND timestamp < '{until}') NOT VALID",
+]
+VALIDATE_BOUND = "ALTER TABLE logs VALIDATE CONSTRAINT logs_partition_bound"
+
+# the existing table becomes the partition for everything up to next month
+PARTITION_LOGS = [
+    "ALTER TABLE logs RENAME TO logs_legacy",
+    "ALTER INDEX logs_pkey RENAME TO logs_legacy_pkey",
+    "ALTER INDEX ix_logs_timestamp RENAME TO ix_logs_legacy_timestamp",
+    "ALTER INDEX ix_logs_user_id_timestamp "
+    "RENAME TO ix_logs_legacy_user_id_timestamp",
+    "CREATE TABLE logs "
+    "(LIKE logs_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+    "PARTITION BY RANGE (timestamp)",
+    "ALTER TABLE logs DROP CONSTRAINT logs_partition_bound",
+    "ALTER TABLE logs ADD PRIMARY KEY (id, timestamp)",
+    "ALTER TABLE logs ADD FOREIGN KEY (user_id) REFERENCES users (id)",
+    "ALTER SEQUENCE logs_id_seq OWNED BY logs.id",
+    "ALTER TABLE logs ATTACH PARTITION logs_legacy "
+    "FOR VALUES FROM (MINVALUE) TO ('{until}')",
+    "ALTER TABLE logs_legacy DROP CONSTRAINT logs_partition_bound",
+    "CREATE INDEX ix_logs_timestamp ON logs (timestamp)",
+    "CREATE INDEX ix_logs_user_id_timestamp ON logs (user_id, timestamp)",
+]
+
+# catches rows past the last monthly partition, so inserts never fail when
+# ensure-partitions hasn't run in time
+DEFAULT_PARTITION = (
+    "CREATE TABLE IF NOT EXISTS logs_default PARTITION OF logs DEFAULT"
+)
+
+
+def month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(moment):
+    return month_start(month_start(moment) + timedelta(days=32))
+
+
+def partition_name(month):
+    return f"logs_{month:%Y_%m}"
+
+
+def is_postgres():
+    return db.session.get_bind().dialect.name == "postgresql"
+
+
+def is_partitioned():
+    """Whether logs is a partitioned table, always False on SQLite"""
+    if not is_postgres():
+        return False
+    return db.session.execute(text(IS_PARTITIONED)).first() is not None
+
+
+def has_partition(month):
+    return db.session.execute(
+        text(HAS_PARTITION), {"name": partition_name(month)}
+    ).first() is not None
+
+
+def partition_logs(now=None):
+    """Convert logs into a table range partitioned by month, returns False
+    if it can't be or already is"""
+    if not is_postgres() or is_partitioned():
+        return False
+    until = next_month(now or datetime.now())
+    # each in its own transaction, only the first and last lock out writes
+    # and neither scans the table
+    for statement in BOUND_LOGS:
+        db.session.execute(text(statement.format(until=until.isoformat())))
+    db.session.commit()
+    db.session.execute(text(VALIDATE_BOUND))
+    db.session.commit()
+    for statement in PARTITION_LOGS:
+        db.session.execute(text(statement.format(until=until.isoformat())))
+    db.session.execute(text(DEFAULT_PARTITION))
+    db.session.commit()
+    return True
+
+
+def create_partition(month):
+    """Create month's partition, moving any of its rows out of the default
+    partition first since Postgres won't attach over them"""
+    name = partition_name(month)
+    bounds = {"start": month, "end": next_month(month)}
+    db.session.execute(text(
+        f"CREATE TABLE {name} "
+        f"(LIKE logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    # name is formatted from a datetime, never from input
+    db.session.execute(text(
+        f"WITH moved AS ("  # nosec B608
+        f"DELETE FROM logs_default "
+        f"WHERE timestamp >= :start AND timestamp < :end RETURNING *"
+        f") INSERT INTO {name} SELECT * FROM moved"
+    ), bounds)
+    db.session.execute(text(
+        f"ALTER TABLE logs ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{month.isoformat()}') "
+        f"TO ('{next_month(month).isoformat()}')"
+    ))
+
+
+def ensure_partitions(months_ahead=3, now=None):
+    """Create the monthly partitions new logs will be written to, and the
+    default partition for anything later, returns their names"""
+    if not is_partitioned():
+        return []
+    db.session.execute(text(DEFAULT_PARTITION))
+    created = []
+    month = next_month(now or datetime.now())
+    for _ in range(months_ahead):
+        if not has_partition(month):
+            create_partition(month)
+            created.append(partition_name(month))
+        month = next_month(month)
+    db.session.commit()
+    return created
+
+
+def archive_path(archive_dir, month):
+    """A file name for a month's archive that isn't taken yet"""
+    path = os.path.join(archive_dir, f"logs-{month:%Y-%m}.ndjson.gz")
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(
+            archive_dir, f"logs-{month:%Y-%m}.{suffix}.ndjson.gz"
+        )
+        suffix += 1
+    return path
+
+
+def archive_month(month, archive_dir, batch_size=1000):
+    """Move one month of logs into a gzipped NDJSON file, returns the
+    number of rows archived"""
+    in_month = (
+        (Log.timestamp >= month) & (Log.timestamp < next_month(month))
+    )
+    rows = (
+        Log.query
+        .with_entities(Log.id, Log.user_id, Log.action, Log.timestamp)
+        .filter(in_month)
+        .order_by(Log.timestamp, Log.id)
+        .yield_per(batch_size)
+    )
+
+    os.makedirs(archive_dir, exist_ok=True)
+    path = archive_path(archive_dir, month)
+    partial = path + ".partial"
+    count = 0
+    with gzip.open(partial, "wt", encoding="utf-8") as archive:
+        for row in rows:
+            values = dict(zip(ARCHIVE_COLUMNS, row))
+            values["timestamp"] = values["timestamp"].isoformat()
+            archive.write(json.dumps(values) + "\n")
+            count += 1
+    if not count:
+        os.remove(partial)
+        return 0
+    os.replace(partial, path)
+
+    # only drop rows once they are safely on disk
+    try:
+        if is_partitioned() and has_partition(month):
+            name = partition_name(month)
+            db.session.execute(
+                text(f"ALTER TABLE logs DETACH PARTITION {name}")
+            )
+            db.session.execute(text(f"DROP TABLE {name}"))
+        # rows the default partition took before the month had its own
+        Log.query.filter(in_month).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        os.remove(path)
+        raise
+    return count
+
+
+def archive_logs(older_than_days, archive_dir=DEFAULT_ARCHIVE_DIR,
+                 now=None, batch_size=1000):
+    """Archive every whole month of logs older than older_than_days,
+    returns {month: rows archived}"""
+    cutoff = (now or datetime.now()) - timedelta(days=older_than_days)
+    oldest = db.session.query(func.min(Log.timestamp)).scalar()
+    archived = {}
+    if oldest is None:
+        return archived
+
+    month = month_start(oldest)
+    while next_month(month) <= cutoff:
+        count = archive_month(month, archive_dir, batch_size)
+        if count:
+            archived[f"{month:%Y-%m}"] = count
+        month = next_month(month)
+    return archived
+
+
+def archived_logs(archive_dir, start=None, end=None, user_id=None):
+    """Yield archived (id, user_id, action, timestamp) rows within
+    [start, end), oldest first"""
+    paths = sorted(glob.glob(os.path.join(archive_dir, "logs-*.ndjson.gz")))
+    for path in paths:
+        month = datetime.strptime(
+            os.path.basename(path)[5:12], "%Y-%m"
+        )
+        if (end and month >= end) or (start and next_month(month) <= start):
+            continue
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            for line in archive:
+                values = json.loads(line)
+                timestamp = datetime.fromisoformat(values["timestamp"])
+                if start and timestamp < start:
+                    continue
+                if end and timestamp >= end:
+                    continue
+                if user_id is not None and values["user_id"] != user_id:
+                    continue
+                yield (
+                    values["id"], values["user_id"], values["action"],
+                    timestamp
+                )
+
+
+def main():
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description="Audit log retention")
+    parser.add_argument(
+        "command", choices=["partition", "ensure-partitions", "archive"]
+    )
+    parser.add_argument("--days", type=int, default=None,
+                        help="archive months older than this many days")
+    parser.add_argument("--dir", default=None, help="archive directory")
+    parser.add_argument("--months-ahead", type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.command == "partition":
+            if partition_logs():
+                print("Converted logs to a partitioned table")
+            else:
+                print("logs is already partitioned or not on Postgres")
+            ensure_partitions(args.months_ahead)
+        elif args.command == "ensure-partitions":
+            for name in ensure_partitions(args.months_ahead):
+                print(f"Created partition {name}")
+        else:
+            ensure_partitions(args.months_ahead)
+            archived = archive_logs(
+                args.days or app.config.get("LOG_RETENTION_DAYS", 90),
+                args.dir or app.config.get(
+                    "LOG_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR
+                )
+            )
+            for month, count in archived.items():
+                print(f"Archived {count} logs from {month}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import hashlib
+import json
+from flask import Blueprint, request, session, current_app, jsonify
+from routes.utils import (
+    current_user, keyset_paginate, decode_cursor, page_size, export_value
+)
+from routes.assets import (
+    scoped_assets_query, ASSET_SORT_COLUMNS, ASSET_SORT_KEYS,
+    ASSET_EXPORT_COLUMNS
+)
+from models import Asset, User, Department
+from db_pool import pool_monitor
+from cache import reference_cache
+
+api_blueprint = Blueprint('api', __name__, url_prefix='/api/v1')
+
+USER_FIELDS = ["id", "username", "role"]
+DEPARTMENT_FIELDS = ["id", "name"]
+
+
+@api_blueprint.before_request
+def api_login_required():
+    """JSON clients get a 401 rather than a redirect to the login page"""
+    if 'user_id' not in session:
+        return jsonify(error="Authentication required"), 401
+
+
+def select_fields(available):
+    """Fields requested with ?fields=a,b, None if any are unknown"""
+    requested = request.args.get('fields')
+    if not requested:
+        return available
+    fields = [field.strip() for field in requested.split(',')]
+    if any(field not in available for field in fields):
+        return None
+    return fields
+
+
+def unknown_fields(available):
+    return jsonify(
+        error=f"Unknown field, choose from: {', '.join(available)}"
+    ), 400
+
+
+def api_page(query, sort_column, id_column, key, descending=False):
+    """Keyset paginate query from the after, before and per_page
+    arguments"""
+    return keyset_paginate(
+        query,
+        sort_column,
+        id_column,
+        key=key,
+        descending=descending,
+        after=decode_cursor(
+            request.args.get('after'), sort_column, id_column
+        ),
+        before=decode_cursor(
+            request.args.get('before'), sort_column, id_column
+        ),
+        per_page=page_size(
+            request.args.get('per_page'),
+            current_app.config.get('API_PAGE_SIZE', 100),
+            current_app.config.get('API_MAX_PAGE_SIZE', 1000)
+        )
+    )
+
+
+def version_etag(user, *entities):
+    """A strong ETag from the version stamps of the entities a response is
+    built from, the requesting user and the query string. Checked before
+    any listing query runs, so a match costs one primary key lookup."""
+    validator = json.dumps([
+        reference_cache.stamp(*entities), user.id, user.role,
+        sorted(request.args.items(multi=True))
+    ])
+    return hashlib.sha256(validator.encode()).hexdigest()
+
+
+def not_modified(etag):
+    """304 response if If-None-Match already has etag, otherwise None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def conditional_json(page, fields, etag):
+    """JSON response for a page, tagged with etag from version_etag"""
+    body = json.dumps({
+        "items": [
+            {field: export_value(getattr(row, field)) for field in fields}
+            for row in page["items"]
+        ],
+        "next_cursor": page["next_cursor"],
+        "prev_cursor": page["prev_cursor"],
+    }, separators=(',', ':'))
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api_blueprint.route('/assets')
+def assets():
+    user = current_user()
+    fields = select_fields(ASSET_EXPORT_COLUMNS)
+    if fields is None:
+        return unknown_fields(ASSET_EXPORT_COLUMNS)
+    # owner and department names are part of an asset's fields
+    etag = version_etag(user, 'assets', 'users', 'departments')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    sort = request.args.get('sort', 'id')
+    if sort not in ASSET_SORT_COLUMNS:
+        sort = 'id'
+    page = api_page(
+        scoped_assets_query(user, request.args.get('q', '').strip()),
+        ASSET_SORT_COLUMNS[sort],
+        Asset.id,
+        key=lambda row: (getattr(row, ASSET_SORT_KEYS[sort]), row.id),
+        descending=request.args.get('order', 'asc') == 'desc'
+    )
+    return conditional_json(page, fields, etag)
+
+
+@api_blueprint.route('/users')
+def users():
+    user = current_user()
+    fields = select_fields(USER_FIELDS)
+    if fields is None:
+        return unknown_fields(USER_FIELDS)
+    etag = version_etag(user, 'users')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    users_query = User.query
+    if user.role != 'Admin':
+        users_query = users_query.filter(User.id == user.id)
+    sort_column = User.username if request.args.get('sort') == 'username' \
+        else User.id
+    page = api_page(
+        users_query,
+        sort_column,
+        User.id,
+        key=lambda row: (getattr(row, sort_column.key), row.id)
+    )
+    return conditional_json(page, fields, etag)
+
+
+@api_blueprint.route('/departments')
+def departments():
+    fields = select_fields(DEPARTMENT_FIELDS)
+    if fields is None:
+        return unknown_fields(DEPARTMENT_FIELDS)
+    etag = version_etag(current_user(), 'departments')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    sort_column = Department.name if request.args.get('sort') == 'name' \
+        else Department.id
+    page = api_page(
+        Department.query,
+        sort_column,
+        Department.id,
+        key=lambda row: (getattr(row, sort_column.key), row.id)
+    )
+    return conditional_json(page, fields, etag)
+
+
+@api_blueprint.route('/pool')
+def pool():
+    """Connection pool occupancy and wait times for this worker process"""
+    if current_user().role != 'Admin':
+        return jsonify(error="Admin access required"), 403
+    return jsonify(pool_monitor.stats())
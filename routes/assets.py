@@ -1,46 +1,94 @@
-from flask import Blueprint, render_template, request, flash, url_for, redirect
+import csv
+import io
+from flask import (
+    Blueprint, request, flash, url_for, redirect,
+    current_app, jsonify, Response, stream_with_context
+)
 from datetime import datetime
-from routes.utils import login_required, current_user, log_action
+from sqlalchemy import insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from routes.utils import (
+    login_required, current_user, log_action, log_actions, render_and_log,
+    keyset_paginate,
+    decode_cursor, page_size, stream_csv, stream_ndjson
+)
 from database import db
 from models import Asset, User, Department
+from cache import metrics_cache, reference_cache
+from search import asset_search_ids
 
 assets_blueprint = Blueprint('assets', __name__)
 
 
+ASSET_SORT_COLUMNS = {
+    "id": Asset.id,
+    "date_created": Asset.date_created,
+    "name": Asset.name,
+    "owner": User.username,
+    "department": Department.name,
+}
+ASSET_SORT_KEYS = {
+    "id": "id",
+    "date_created": "date_created",
+    "name": "name",
+    "owner": "owner_username",
+    "department": "department_name",
+}
+
+
+def scoped_assets_query(user, search=None):
+    """Assets joined to owner and department, limited to the user's own
+    assets unless they are an Admin and to assets matching search"""
+    assets_query = (
+        Asset.query
+        .join(User, Asset.owner_id == User.id)
+        .join(Department, Asset.department_id == Department.id)
+        .with_entities(
+            Asset.id, Asset.name, Asset.description,
+            Asset.type, Asset.serial_number,
+            Asset.date_created, Asset.in_use, Asset.approved,
+            Asset.owner_id, Asset.department_id,
+            User.username.label("owner_username"),
+            Department.name.label("department_name")
+        )
+    )
+    if user.role != 'Admin':
+        assets_query = assets_query.filter(Asset.owner_id == user.id)
+    matching_ids = asset_search_ids(search)
+    if matching_ids is not None:
+        assets_query = assets_query.filter(Asset.id.in_(matching_ids))
+    return assets_query
+
+
 @assets_blueprint.route('/assets')
 @login_required
 def assets():
     user = current_user()
+    search = request.args.get('q', '').strip()
 
-    if user.role == 'Admin':
-        assets_query = (
-            Asset.query
-            .join(User, Asset.owner_id == User.id)
-            .join(Department, Asset.department_id == Department.id)
-            .add_columns(
-                Asset.id, Asset.name, Asset.description,
-                Asset.type, Asset.serial_number,
-                Asset.date_created, Asset.in_use, Asset.approved,
-                Asset.owner_id, Asset.department_id,
-                User.username.label("owner_username"),
-                Department.name.label("department_name")
-            )
-        )
-    else:
-        assets_query = (
-            Asset.query
-            .filter_by(owner_id=user.id)
-            .join(User, Asset.owner_id == User.id)
-            .join(Department, Asset.department_id == Department.id)
-            .add_columns(
-                Asset.id, Asset.name, Asset.description,
-                Asset.type, Asset.serial_number,
-                Asset.date_created, Asset.in_use, Asset.approved,
-                Asset.owner_id, Asset.department_id,
-                User.username.label("owner_username"),
-                Department.name.label("department_name")
-            )
-        )
+    sort = request.args.get('sort', 'date_created')
+    if sort not in ASSET_SORT_COLUMNS:
+        sort = 'date_created'
+    descending = request.args.get('order', 'desc') != 'asc'
+    sort_column = ASSET_SORT_COLUMNS[sort]
+    per_page = page_size(
+        request.args.get('per_page'),
+        current_app.config.get('ASSETS_PAGE_SIZE', 50),
+        current_app.config.get('ASSETS_MAX_PAGE_SIZE', 200)
+    )
+
+    page = keyset_paginate(
+        scoped_assets_query(user, search),
+        sort_column,
+        Asset.id,
+        key=lambda row: (getattr(row, ASSET_SORT_KEYS[sort]), row.id),
+        descending=descending,
+        after=decode_cursor(request.args.get('after'), sort_column, Asset.id),
+        before=decode_cursor(
+            request.args.get('before'), sort_column, Asset.id
+        ),
+        per_page=per_page
+    )
 
     assets_list = [
         {
@@ -63,19 +111,319 @@ def assets():
             "owner_username": asset.owner_username,
             "department_name": asset.department_name
         }
-        for asset in assets_query.all()
+        for asset in page["items"]
     ]
 
-    departments = Department.query.all()
-    users = User.query.order_by(User.username.asc()).all()
-    log_action(user.id, f"Assets viewed by {user.username} (ID: {user.id})")
-    return render_template(
+    return render_and_log(
+        user.id,
+        f"Assets viewed by {user.username} (ID: {user.id})",
         'assets.html',
         assets=assets_list,
         user=user,
-        departments=departments,
-        users=users
+        search=search,
+        sort=sort,
+        order='desc' if descending else 'asc',
+        per_page=per_page,
+        next_cursor=page["next_cursor"],
+        prev_cursor=page["prev_cursor"]
+    )
+
+
+@assets_blueprint.route('/assets/search')
+@login_required
+def search_assets():
+    user = current_user()
+    search = request.args.get('q', '').strip()
+    if asset_search_ids(search) is None:
+        return jsonify(results=[])
+
+    limit = page_size(
+        request.args.get('limit'),
+        current_app.config.get('ASSETS_SEARCH_LIMIT', 20),
+        current_app.config.get('ASSETS_MAX_PAGE_SIZE', 200)
+    )
+    matches = (
+        scoped_assets_query(user, search)
+        .order_by(Asset.date_created.desc(), Asset.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return jsonify(results=[
+        {
+            "id": asset.id,
+            "name": asset.name,
+            "type": asset.type,
+            "serial_number": asset.serial_number,
+            "owner_username": asset.owner_username,
+            "department_name": asset.department_name,
+            "approved": asset.approved
+        }
+        for asset in matches
+    ])
+
+
+ASSET_EXPORT_COLUMNS = [
+    "id", "name", "description", "type", "serial_number", "date_created",
+    "in_use", "approved", "owner_username", "department_name",
+]
+ASSET_EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
+
+
+@assets_blueprint.route('/assets/export.<string:export_format>')
+@login_required
+def export_assets(export_format):
+    user = current_user()
+    if export_format not in ASSET_EXPORT_FORMATS:
+        flash("Unsupported export format", "danger")
+        return redirect(url_for('assets.assets'))
+
+    search = request.args.get('q', '').strip()
+    rows = (
+        scoped_assets_query(user, search)
+        .order_by(Asset.id)
+        .yield_per(current_app.config.get('EXPORT_BATCH_SIZE', 1000))
     )
+    log_action(
+        user.id, f"Assets exported by {user.username} (ID: {user.id})"
+    )
+
+    stream, mimetype = ASSET_EXPORT_FORMATS[export_format]
+    return Response(
+        stream_with_context(stream(
+            ASSET_EXPORT_COLUMNS,
+            (
+                [getattr(row, column) for column in ASSET_EXPORT_COLUMNS]
+                for row in rows
+            )
+        )),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition":
+                f"attachment; filename=assets.{export_format}"
+        }
+    )
+
+
+IMPORT_FLAGS = {
+    "1": True, "true": True, "yes": True, "y": True,
+    "0": False, "false": False, "no": False, "n": False,
+}
+
+
+def parse_flag(value, default):
+    """Parse a yes/no CSV cell, None if it isn't recognised"""
+    value = (value or "").strip().lower()
+    if not value:
+        return default
+    return IMPORT_FLAGS.get(value)
+
+
+def validate_import_row(row, user, departments, users):
+    """Turn a CSV row into Asset column values, returns (values, errors)"""
+    errors = []
+    name = (row.get("name") or "").strip()
+    serial_number = (row.get("serial_number") or "").strip()
+    asset_type = (row.get("type") or "").strip() or None
+    department_name = (row.get("department") or "").strip()
+    owner_name = (row.get("owner") or "").strip()
+
+    if not name:
+        errors.append("name is required")
+    elif len(name) > 150:
+        errors.append("name is longer than 150 characters")
+    if not serial_number:
+        errors.append("serial_number is required")
+    elif len(serial_number) > 150:
+        errors.append("serial_number is longer than 150 characters")
+    if asset_type and len(asset_type) > 50:
+        errors.append("type is longer than 50 characters")
+
+    department_ids = departments.get(department_name, ())
+    department_id = department_ids[0] if len(department_ids) == 1 else None
+    if not department_ids:
+        errors.append(f"unknown department '{department_name}'")
+    elif department_id is None:
+        errors.append(
+            f"department name '{department_name}' matches more than one "
+            f"department"
+        )
+
+    if user.role == 'Admin':
+        owner_id = users.get(owner_name)
+        if owner_id is None:
+            errors.append(f"unknown owner '{owner_name}'")
+    else:
+        owner_id = user.id
+        if owner_name and owner_name != user.username:
+            errors.append("you can only import assets for yourself")
+
+    in_use = parse_flag(row.get("in_use"), True)
+    if in_use is None:
+        errors.append("in_use must be yes or no")
+    approved = parse_flag(row.get("approved"), False)
+    if approved is None:
+        errors.append("approved must be yes or no")
+    elif user.role != 'Admin':
+        approved = False
+
+    return {
+        "name": name,
+        "description": (row.get("description") or "").strip() or None,
+        "type": asset_type,
+        "serial_number": serial_number,
+        "in_use": in_use,
+        "approved": approved,
+        "owner_id": owner_id,
+        "department_id": department_id,
+    }, errors
+
+
+def department_ids_by_name():
+    """Department ids keyed by name, names aren't unique so each maps to a
+    tuple of every department with it"""
+    departments = {}
+    for name, department_id in db.session.query(
+        Department.name, Department.id
+    ).order_by(Department.id):
+        departments[name] = departments.get(name, ()) + (department_id,)
+    return departments
+
+
+def existing_serials(serials):
+    return {
+        serial for (serial,) in
+        db.session.query(Asset.serial_number)
+        .filter(Asset.serial_number.in_(serials))
+    }
+
+
+def insert_import_batch(batch, report):
+    """Insert a batch of (line, values) rows in one transaction, skipping
+    serial numbers that already exist"""
+    existing = existing_serials(
+        [values["serial_number"] for line, values in batch]
+    )
+    date_created = datetime.now()
+    rows = []
+    for line, values in batch:
+        if values["serial_number"] in existing:
+            add_import_error(
+                report, line, ["serial_number already exists"]
+            )
+        else:
+            rows.append((line, dict(values, date_created=date_created)))
+    try:
+        if rows:
+            db.session.execute(insert(Asset), [row for line, row in rows])
+        db.session.commit()
+    except IntegrityError:
+        # another request created one of these serial numbers meanwhile,
+        # retry row by row so only the conflicting lines are rejected
+        db.session.rollback()
+        insert_import_rows(rows, report)
+        return
+    report["imported"] += len(rows)
+
+
+def insert_import_rows(rows, report):
+    """Insert (line, values) rows one savepoint each, rejecting those that
+    conflict"""
+    for line, values in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Asset), [values])
+        except IntegrityError:
+            add_import_error(
+                report, line, ["conflicts with an existing asset"]
+            )
+        else:
+            report["imported"] += 1
+    db.session.commit()
+
+
+def add_import_error(report, line, errors):
+    report["rejected"] += 1
+    if len(report["errors"]) < current_app.config.get(
+        'ASSETS_IMPORT_MAX_ERRORS', 1000
+    ):
+        report["errors"].append({"line": line, "errors": errors})
+    else:
+        report["errors_truncated"] = True
+
+
+@assets_blueprint.route('/assets/import', methods=['POST'])
+@login_required
+def import_assets():
+    user = current_user()
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify(error="No CSV file uploaded"), 400
+
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig')
+    reader = csv.DictReader(stream)
+    required = {"name", "serial_number", "department"}
+    if user.role == 'Admin':
+        required.add("owner")
+    try:
+        missing = required - set(reader.fieldnames or [])
+    except UnicodeDecodeError:
+        return jsonify(error="File is not UTF-8 encoded CSV"), 400
+    if missing:
+        return jsonify(
+            error=f"Missing columns: {', '.join(sorted(missing))}"
+        ), 400
+
+    # resolved once up front rather than per row
+    departments = reference_cache.get(
+        'departments', 'ids_by_name', department_ids_by_name
+    )
+    users = reference_cache.get(
+        'users', 'ids_by_username',
+        lambda: dict(db.session.query(User.username, User.id))
+    ) if user.role == 'Admin' else {}
+    batch_size = current_app.config.get('ASSETS_IMPORT_BATCH_SIZE', 1000)
+
+    report = {
+        "imported": 0, "rejected": 0, "errors": [], "errors_truncated": False
+    }
+    seen_serials = set()
+    batch = []
+    try:
+        for row in reader:
+            values, errors = validate_import_row(
+                row, user, departments, users
+            )
+            if values["serial_number"] in seen_serials:
+                errors.append("serial_number is repeated in the file")
+            if errors:
+                add_import_error(report, reader.line_num, errors)
+                continue
+            seen_serials.add(values["serial_number"])
+            batch.append((reader.line_num, values))
+            if len(batch) >= batch_size:
+                insert_import_batch(batch, report)
+                batch = []
+        if batch:
+            insert_import_batch(batch, report)
+    except UnicodeDecodeError:
+        add_import_error(
+            report, reader.line_num + 1, ["file is not UTF-8 encoded"]
+        )
+    except csv.Error as e:
+        add_import_error(report, reader.line_num, [f"invalid CSV: {e}"])
+
+    if report["imported"]:
+        metrics_cache.invalidate()
+        reference_cache.bump('assets')
+    log_action(
+        user.id,
+        f"{report['imported']} assets imported by {user.username} "
+        f"(ID: {user.id}), {report['rejected']} rows rejected"
+    )
+    return jsonify(report)
 
 
 @assets_blueprint.route('/asset/create', methods=['POST'])
@@ -99,6 +447,8 @@ def create_asset():
 
     db.session.add(new_asset)
     db.session.commit()
+    metrics_cache.invalidate()
+    reference_cache.bump('assets')
     log_action(
         user.id,
         f"Asset (ID: {new_asset.id}, Name: {new_asset.name}) "
@@ -139,6 +489,8 @@ def edit_asset(asset_id):
     if user.role == 'Admin':
         asset.approved = True if data.get('approved') == "1" else False
     db.session.commit()
+    metrics_cache.invalidate()
+    reference_cache.bump('assets')
     log_action(
         user.id,
         f"Asset (ID: {asset.id}, Name: {asset.name}) updated by "
@@ -168,6 +520,8 @@ def delete_asset(asset_id):
 
     db.session.delete(asset)
     db.session.commit()
+    metrics_cache.invalidate()
+    reference_cache.bump('assets')
     log_action(
         user.id,
         f"Asset (ID: {asset.id}, Name: {asset.name}) "
@@ -196,6 +550,8 @@ def approve_asset(asset_id):
         return redirect(url_for('assets.assets'))
     asset.approved = True
     db.session.commit()
+    metrics_cache.invalidate()
+    reference_cache.bump('assets')
     log_action(
         user.id,
         f"Asset (ID: {asset.id}, Name: {asset.name}) "
@@ -203,3 +559,60 @@ def approve_asset(asset_id):
     )
     flash("Asset approved", "success")
     return redirect(url_for('assets.assets'))
+
+
+@assets_blueprint.route('/assets/approve', methods=['POST'])
+@login_required
+def bulk_approve_assets():
+    user = current_user()
+    action = request.form.get('action', 'approve')
+    if user.role != 'Admin':
+        log_action(
+            user.id,
+            f"Bulk asset {action} attempted by {user.username} "
+            f"(ID: {user.id})"
+        )
+        flash("Unauthorised Access", "danger")
+        return redirect(url_for('dashboard.dashboard'))
+    if action not in ('approve', 'reject'):
+        flash("Unknown bulk action", "danger")
+        return redirect(url_for('dashboard.dashboard'))
+
+    # only ever touches assets that are still pending
+    conditions = [Asset.approved.is_(False)]
+    if request.form.get('all_pending') == '1':
+        matching_ids = asset_search_ids(request.form.get('q', '').strip())
+        if matching_ids is not None:
+            conditions.append(Asset.id.in_(matching_ids))
+        department_id = request.form.get('department_id', type=int)
+        if department_id:
+            conditions.append(Asset.department_id == department_id)
+    else:
+        asset_ids = request.form.getlist('asset_ids', type=int)
+        if not asset_ids:
+            flash("No assets selected", "info")
+            return redirect(url_for('dashboard.dashboard'))
+        conditions.append(Asset.id.in_(asset_ids))
+
+    if action == 'approve':
+        statement = update(Asset).where(*conditions).values(approved=True)
+        verb = "approved"
+    else:
+        statement = delete(Asset).where(*conditions)
+        verb = "rejected"
+    changed = db.session.execute(
+        statement.returning(Asset.id, Asset.name),
+        execution_options={"synchronize_session": False}
+    ).all()
+    # committed together, so no change goes without its audit row
+    log_actions(user.id, [
+        f"Asset (ID: {asset_id}, Name: {name}) {verb} by "
+        f"{user.username} (ID: {user.id})"
+        for asset_id, name in changed
+    ])
+    db.session.commit()
+    metrics_cache.invalidate()
+    reference_cache.bump('assets')
+
+    flash(f"{len(changed)} assets {verb}", "success")
+    return redirect(url_for('dashboard.dashboard'))
@@ -2,12 +2,12 @@ import re
 from flask import (
     Blueprint, render_template, request, flash, url_for, redirect, session
 )
-from werkzeug.security import (
-    generate_password_hash, check_password_hash
-)
 from routes.utils import log_action, login_required
 from database import db
 from models import User
+from passwords import password_hasher
+from cache import metrics_cache, identity_cache, reference_cache
+from ratelimit import rate_limiter
 
 auth_blueprint = Blueprint('auth', __name__)
 USERNAME_REGEX = re.compile(r'^[a-zA-Z0-9_]+$')
@@ -20,6 +20,10 @@ def register():
         password = request.form.get('password')
         role = 'User'
 
+        # turned away before the username lookup or any hashing
+        if not rate_limiter.allow('register_ip', request.remote_addr):
+            return too_many_attempts('register.html')
+
         if not username or not password:
             flash('Username and password are required.', 'danger')
         elif User.query.filter_by(username=username).first():
@@ -32,7 +36,7 @@ def register():
                 )
                 return redirect(url_for('auth.register'))
 
-            password_hash = generate_password_hash(password)
+            password_hash = password_hasher.hash(password)
             new_user = User(
                 username=username,
                 password_hash=password_hash,
@@ -40,6 +44,8 @@ def register():
             )
             db.session.add(new_user)
             db.session.commit()
+            metrics_cache.invalidate()
+            reference_cache.bump('users')
             log_action(
                 new_user.id,
                 f"Registered account as {username} (ID: {new_user.id})"
@@ -50,19 +56,35 @@ def register():
     return render_template('register.html')
 
 
+def too_many_attempts(template):
+    flash('Too many attempts, please wait a minute and try again.', 'danger')
+    return render_template(template), 429
+
+
 @auth_blueprint.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
 
+        if not (
+            rate_limiter.allow('login_ip', request.remote_addr)
+            and rate_limiter.allow('login_username', username.lower())
+        ):
+            return too_many_attempts('login.html')
+
         user = User.query.filter_by(username=username).first()
 
         if user is None:
             flash('Incorrect username.', 'danger')
-        elif not check_password_hash(user.password_hash, password):
+        elif not password_hasher.check(user.password_hash, password):
             flash('Incorrect password.', 'danger')
         else:
+            # upgrade hashes made with an older method or cost
+            if password_hasher.needs_rehash(user.password_hash):
+                user.password_hash = password_hasher.hash(password)
+                db.session.commit()
+                identity_cache.invalidate(user.id)
             session.clear()
             session['user_id'] = user.id
             session['username'] = user.username
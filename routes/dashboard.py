@@ -1,10 +1,31 @@
-from flask import Blueprint, render_template, url_for, redirect
+from flask import Blueprint, render_template, url_for, redirect, current_app
+from sqlalchemy import select, func, case
 from routes.utils import login_required, current_user
+from database import db
 from models import Asset, User, Department
+from cache import metrics_cache
 
 dashboard_blueprint = Blueprint('dashboard', __name__)
 
 
+def dashboard_metrics():
+    """Count assets, pending assets, users and departments in a single
+    query, one pass over assets plus two scalar subqueries"""
+    metrics = db.session.execute(
+        select(
+            func.count(Asset.id).label("total_assets"),
+            func.count(
+                case((Asset.approved.is_(False), Asset.id))
+            ).label("pending_assets"),
+            select(func.count(User.id))
+            .scalar_subquery().label("total_users"),
+            select(func.count(Department.id))
+            .scalar_subquery().label("total_departments")
+        )
+    ).one()
+    return dict(metrics._mapping)
+
+
 @dashboard_blueprint.route('/')
 def index():
     if current_user():
@@ -67,12 +88,11 @@ def dashboard():
         for asset in assets
     ]
 
-    metrics = {
-        "total_assets": Asset.query.count(),
-        "pending_assets": Asset.query.filter_by(approved=False).count(),
-        "total_users": User.query.count(),
-        "total_departments": Department.query.count()
-    }
+    metrics = metrics_cache.get(
+        "dashboard",
+        dashboard_metrics,
+        ttl=current_app.config.get("DASHBOARD_METRICS_TTL", 30)
+    )
 
     return render_template(
         'dashboard.html',
@@ -1,7 +1,13 @@
-from flask import Blueprint, render_template, request, flash, url_for, redirect
-from routes.utils import login_required, current_user, log_action
+from flask import (
+    Blueprint, request, flash, url_for, redirect, current_app, jsonify
+)
+from routes.utils import (
+    login_required, current_user, log_action, render_and_log,
+    prefix_filter, page_size
+)
 from database import db
 from models import Department, Asset
+from cache import metrics_cache, reference_cache
 
 departments_blueprint = Blueprint('departments', __name__)
 
@@ -10,18 +16,50 @@ departments_blueprint = Blueprint('departments', __name__)
 @login_required
 def departments():
     user = current_user()
-    all_departments = Department.query.all()
-    log_action(
-        user.id,
-        f"Departments viewed by {user.username} (ID: {user.id})"
+    all_departments = reference_cache.get(
+        'departments', 'all', lambda: [
+            {"id": department.id, "name": department.name}
+            for department in Department.query.order_by(Department.id)
+        ]
     )
-    return render_template(
+    return render_and_log(
+        user.id,
+        f"Departments viewed by {user.username} (ID: {user.id})",
         'departments.html',
         user=user,
         departments=all_departments
     )
 
 
+@departments_blueprint.route('/departments/search')
+@login_required
+def search_departments():
+    """Department picker typeahead, names starting with q"""
+    search = request.args.get('q', '').strip()
+    if not search:
+        return jsonify(results=[])
+
+    limit = page_size(
+        request.args.get('limit'),
+        current_app.config.get('TYPEAHEAD_LIMIT', 20),
+        current_app.config.get('TYPEAHEAD_MAX_LIMIT', 100)
+    )
+
+    def load():
+        matches = (
+            Department.query
+            .with_entities(Department.id, Department.name)
+            .filter(prefix_filter(Department.name, search))
+            .order_by(Department.name)
+            .limit(limit)
+        )
+        return [{"id": match.id, "name": match.name} for match in matches]
+
+    return jsonify(results=reference_cache.get(
+        'departments', ('search', search.lower(), limit), load
+    ))
+
+
 @departments_blueprint.route('/department/create', methods=['POST'])
 @login_required
 def create_department():
@@ -47,6 +85,8 @@ def create_department():
     new_department = Department(name=name)
     db.session.add(new_department)
     db.session.commit()
+    metrics_cache.invalidate()
+    reference_cache.bump('departments')
     log_action(
         user.id,
         f"Department {name} created by {user.username} "
@@ -78,6 +118,7 @@ def edit_department(dept_id):
         return redirect(url_for('departments.departments'))
     department.name = new_name
     db.session.commit()
+    reference_cache.bump('departments')
     log_action(
         user.id,
         f"Department (ID: {dept_id}) updated to {new_name} by "
@@ -112,6 +153,8 @@ def delete_department(dept_id):
 
     db.session.delete(department)
     db.session.commit()
+    metrics_cache.invalidate()
+    reference_cache.bump('departments', 'assets')
     log_action(
         user.id,
         f"Department (ID: {dept_id}, Name: {department.name}) "
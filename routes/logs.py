@@ -1,10 +1,42 @@
-from flask import Blueprint, render_template, flash, url_for, redirect
-from routes.utils import login_required, current_user, log_action
+import itertools
+from datetime import datetime
+from flask import (
+    Blueprint, request, flash, url_for, redirect,
+    current_app, Response, stream_with_context
+)
+from routes.utils import (
+    login_required, current_user, log_action, render_and_log, keyset_paginate,
+    decode_cursor, page_size, stream_csv, stream_ndjson, gzip_stream
+)
 from models import Log
+from retention import archived_logs, DEFAULT_ARCHIVE_DIR
 
 logs_blueprint = Blueprint('logs', __name__)
 
 
+def parse_timestamp(value):
+    """Parse an ISO timestamp from a query string, None if missing or
+    invalid"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def filtered_logs_query(user_id=None, start=None, end=None):
+    """Logs for one user and/or within [start, end)"""
+    logs_query = Log.query
+    if user_id is not None:
+        logs_query = logs_query.filter(Log.user_id == user_id)
+    if start:
+        logs_query = logs_query.filter(Log.timestamp >= start)
+    if end:
+        logs_query = logs_query.filter(Log.timestamp < end)
+    return logs_query
+
+
 @logs_blueprint.route('/logs')
 @login_required
 def logs():
@@ -18,9 +50,31 @@ def logs():
         flash("Unauthorised Access", "danger")
         return redirect(url_for('dashboard.dashboard'))
 
-    all_logs = Log.query.order_by(Log.timestamp.desc()).all()
-    log_action(user.id, f"Logs viewed by {user.username} (ID: {user.id})")
-    return render_template(
+    user_id = request.args.get('user_id', type=int)
+    start = parse_timestamp(request.args.get('start'))
+    end = parse_timestamp(request.args.get('end'))
+    per_page = page_size(
+        request.args.get('per_page'),
+        current_app.config.get('LOGS_PAGE_SIZE', 100),
+        current_app.config.get('LOGS_MAX_PAGE_SIZE', 500)
+    )
+
+    page = keyset_paginate(
+        filtered_logs_query(user_id, start, end),
+        Log.timestamp,
+        Log.id,
+        key=lambda log: (log.timestamp, log.id),
+        descending=True,
+        after=decode_cursor(request.args.get('after'), Log.timestamp, Log.id),
+        before=decode_cursor(
+            request.args.get('before'), Log.timestamp, Log.id
+        ),
+        per_page=per_page
+    )
+
+    return render_and_log(
+        user.id,
+        f"Logs viewed by {user.username} (ID: {user.id})",
         "logs.html",
         logs=[
             {
@@ -28,7 +82,71 @@ def logs():
                 "action": log.action,
                 "timestamp": log.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
             }
-            for log in all_logs
+            for log in page["items"]
         ],
-        user=user
+        user=user,
+        filters={
+            "user_id": user_id,
+            "start": start.strftime("%Y-%m-%dT%H:%M") if start else None,
+            "end": end.strftime("%Y-%m-%dT%H:%M") if end else None,
+            "per_page": per_page,
+        },
+        next_cursor=page["next_cursor"],
+        prev_cursor=page["prev_cursor"]
+    )
+
+
+LOG_EXPORT_COLUMNS = ["id", "user_id", "action", "timestamp"]
+
+
+@logs_blueprint.route('/logs/export.<string:export_format>')
+@login_required
+def export_logs(export_format):
+    user = current_user()
+    if user.role != 'Admin':
+        log_action(
+            user.id,
+            f"Unauthorised logs export attempt by {user.username} "
+            f"(ID: {user.id})"
+        )
+        flash("Unauthorised Access", "danger")
+        return redirect(url_for('dashboard.dashboard'))
+
+    if export_format not in ("csv", "ndjson.gz"):
+        flash("Unsupported export format", "danger")
+        return redirect(url_for('logs.logs'))
+
+    user_id = request.args.get('user_id', type=int)
+    start = parse_timestamp(request.args.get('start'))
+    end = parse_timestamp(request.args.get('end'))
+    # archived months are all older than anything still in the table
+    rows = itertools.chain(
+        archived_logs(
+            current_app.config.get('LOG_ARCHIVE_DIR', DEFAULT_ARCHIVE_DIR),
+            start, end, user_id
+        ),
+        filtered_logs_query(user_id, start, end)
+        .with_entities(Log.id, Log.user_id, Log.action, Log.timestamp)
+        .order_by(Log.timestamp, Log.id)
+        .yield_per(current_app.config.get('EXPORT_BATCH_SIZE', 1000))
+    )
+    log_action(
+        user.id,
+        f"Logs exported by {user.username} (ID: {user.id}) from "
+        f"{start or 'the start'} to {end or 'now'}"
+    )
+
+    if export_format == "csv":
+        body = stream_csv(LOG_EXPORT_COLUMNS, rows)
+        mimetype = "text/csv"
+    else:
+        body = gzip_stream(stream_ndjson(LOG_EXPORT_COLUMNS, rows))
+        mimetype = "application/gzip"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition":
+                f"attachment; filename=logs.{export_format}"
+        }
     )
@@ -1,9 +1,15 @@
 import re
-from flask import Blueprint, render_template, request, flash, url_for, redirect
-from werkzeug.security import generate_password_hash
-from routes.utils import login_required, current_user, log_action
+from flask import (
+    Blueprint, request, flash, url_for, redirect, current_app, jsonify
+)
+from routes.utils import (
+    login_required, current_user, log_action, render_and_log,
+    prefix_filter, page_size
+)
 from database import db
 from models import User, Asset
+from cache import metrics_cache, identity_cache, reference_cache
+from passwords import password_hasher
 
 users_blueprint = Blueprint('users', __name__)
 
@@ -14,11 +20,55 @@ def users():
     user = current_user()
 
     if user.role == 'Admin':
-        all_users = User.query.all()
+        all_users = reference_cache.get('users', 'all', lambda: [
+            {"id": row.id, "username": row.username, "role": row.role}
+            for row in User.query.with_entities(
+                User.id, User.username, User.role
+            ).order_by(User.id)
+        ])
     else:
         all_users = [user]
-    log_action(user.id, f"Users viewed by {user.username} (ID: {user.id})")
-    return render_template('users.html', users=all_users, user=user)
+    return render_and_log(
+        user.id,
+        f"Users viewed by {user.username} (ID: {user.id})",
+        'users.html',
+        users=all_users,
+        user=user
+    )
+
+
+@users_blueprint.route('/users/search')
+@login_required
+def search_users():
+    """Owner picker typeahead, usernames starting with q"""
+    user = current_user()
+    search = request.args.get('q', '').strip()
+    if not search:
+        return jsonify(results=[])
+
+    limit = page_size(
+        request.args.get('limit'),
+        current_app.config.get('TYPEAHEAD_LIMIT', 20),
+        current_app.config.get('TYPEAHEAD_MAX_LIMIT', 100)
+    )
+
+    def load(user_id=None):
+        matches = User.query.with_entities(User.id, User.username).filter(
+            prefix_filter(User.username, search)
+        )
+        if user_id is not None:
+            matches = matches.filter(User.id == user_id)
+        matches = matches.order_by(User.username).limit(limit)
+        return [
+            {"id": match.id, "username": match.username} for match in matches
+        ]
+
+    # only the admin directory is shared between users
+    if user.role != 'Admin':
+        return jsonify(results=load(user.id))
+    return jsonify(results=reference_cache.get(
+        'users', ('search', search.lower(), limit), load
+    ))
 
 
 @users_blueprint.route('/user/edit/<int:user_id>', methods=['POST'])
@@ -57,10 +107,12 @@ def edit_user(user_id):
 
     # only update password if its changed
     if password != '[HIDDEN]':
-        target_user.password_hash = generate_password_hash(password)
+        target_user.password_hash = password_hasher.hash(password)
 
     target_user.role = role
     db.session.commit()
+    identity_cache.invalidate(target_user.id)
+    reference_cache.bump('users')
     log_action(
         user.id,
         f"User (ID: {target_user.id}) updated by "
@@ -96,6 +148,9 @@ def delete_user(user_id):
     # then delete user
     db.session.delete(target_user)
     db.session.commit()
+    metrics_cache.invalidate()
+    identity_cache.invalidate(target_user.id)
+    reference_cache.bump('users', 'assets')
 
     flash("User deleted", "info")
 
@@ -131,6 +186,8 @@ def promote_user(user_id):
         return redirect(url_for('users.users'))
     target_user.role = "Admin"
     db.session.commit()
+    identity_cache.invalidate(target_user.id)
+    reference_cache.bump('users')
     log_action(
         user.id,
         f"User (ID: {target_user.id}) promoted to Admin by "
@@ -164,11 +221,11 @@ def create_user():
         return redirect(url_for('users.users'))
     password = request.form['password']
     role = request.form['role']
-    password_hash = generate_password_hash(password)
 
     if User.query.filter_by(username=username).first():
         flash("A user already exists with this name", "info")
         return redirect(url_for('users.users'))
+    password_hash = password_hasher.hash(password)
 
     new_user = User(
         username=username,
@@ -177,6 +234,8 @@ def create_user():
     )
     db.session.add(new_user)
     db.session.commit()
+    metrics_cache.invalidate()
+    reference_cache.bump('users')
     log_action(
         user.id,
         f"User (ID: {new_user.id}) created by "
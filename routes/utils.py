@@ -1,14 +1,60 @@
-from flask import session, flash, redirect, url_for
+import base64
+import binascii
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from flask import (
+    session, flash, redirect, url_for, g, current_app, render_template
+)
 from functools import wraps
+from sqlalchemy import tuple_, func, insert
+from sqlalchemy.orm import make_transient_to_detached
 from models import User, Log
-from database import db
+from database import db, code_point_order
+from audit import audit_log
+from cache import identity_cache
 
 
 def current_user():
-    """Get current logged in user"""
-    if 'user_id' in session:
-        return User.query.session.get(User, session['user_id'])
-    return None
+    """Get current logged in user, resolved at most once per request"""
+    if 'user_id' not in session:
+        return None
+    if g.get('current_user_id') != session['user_id']:
+        g.current_user = load_user(session['user_id'])
+        g.current_user_id = session['user_id']
+    return g.current_user
+
+
+def forget_current_user(exc=None):
+    """Drop the memoised user at the end of a request"""
+    g.pop('current_user', None)
+    g.pop('current_user_id', None)
+
+
+def load_user(user_id):
+    """Load a user, from the identity cache when IDENTITY_CACHE_TTL is set"""
+    ttl = current_app.config.get('IDENTITY_CACHE_TTL', 0)
+    if not ttl:
+        return db.session.get(User, user_id)
+
+    def snapshot():
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        return {
+            column.key: getattr(user, column.key)
+            for column in User.__table__.columns
+        }
+
+    columns = identity_cache.get(user_id, snapshot, ttl=ttl)
+    if columns is None:
+        return None
+    # attach the snapshot to this session without querying for it
+    user = User(**columns)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
 
 
 def login_required(f):
@@ -35,8 +81,178 @@ def admin_required(f):
 
 
 def log_action(user_id, action):
-    """Log user actions"""
+    """Log user actions, through the background writer if it is enabled"""
+    if audit_log.enabled:
+        audit_log.write(user_id, action)
+        return
 
     log = Log(user_id=user_id, action=action)
     db.session.add(log)
     db.session.commit()
+
+
+def log_actions(user_id, actions):
+    """Add several user actions to the current transaction in one INSERT,
+    the caller commits them with the change they record. Never goes
+    through the background writer, whose queue drops rows when full."""
+    rows = [{"user_id": user_id, "action": action} for action in actions]
+    if rows:
+        db.session.execute(insert(Log), rows)
+
+
+def render_and_log(user_id, action, template, **context):
+    """Render a page, then log viewing it. Logging first would commit and
+    expire the rows passed in, so the template reloaded them one query per
+    row"""
+    response = render_template(template, **context)
+    log_action(user_id, action)
+    return response
+
+
+def prefix_filter(column, prefix):
+    """Case insensitive starts-with on column, as a range over lower(column)
+    so an index on that expression can serve it. The upper bound is the
+    next code point, so both compare in code point order."""
+    prefix = prefix.lower()
+    lowered = code_point_order(func.lower(column))
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return (
+        (lowered >= prefix)
+        & (lowered < upper)
+        & lowered.startswith(prefix, autoescape=True)
+    )
+
+
+def encode_cursor(*values):
+    """Encode a row's sort key as an opaque url safe cursor"""
+    raw = json.dumps([
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token, *columns):
+    """Decode a cursor back into values typed for the given columns,
+    returns None if the cursor is missing or invalid"""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        decoded = []
+        for value, column in zip(values, columns):
+            python_type = column.type.python_type
+            if python_type is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            else:
+                decoded.append(python_type(value))
+        return tuple(decoded)
+    except (binascii.Error, ValueError, TypeError, NotImplementedError):
+        return None
+
+
+def page_size(value, default, maximum):
+    """Parse a requested page size, clamped between 1 and maximum"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def keyset_paginate(query, sort_column, id_column, key, descending=False,
+                    after=None, before=None, per_page=50):
+    """Fetch one page of query ordered by (sort_column, id_column).
+
+    Seeks past the after/before cursor instead of using OFFSET so the cost
+    of a page stays the same however deep into the table it is. key maps a
+    result row to its (sort value, id) pair.
+    """
+    backwards = after is None and before is not None
+    cursor = before if backwards else after
+    ascending = descending == backwards
+
+    if sort_column is id_column:
+        columns, order_by = id_column, [id_column]
+    else:
+        columns, order_by = (
+            tuple_(sort_column, id_column), [sort_column, id_column]
+        )
+
+    if cursor is not None:
+        position = cursor[-1] if sort_column is id_column else tuple_(*cursor)
+        query = query.filter(
+            columns > position if ascending else columns < position
+        )
+    query = query.order_by(
+        *[col.asc() if ascending else col.desc() for col in order_by]
+    )
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, cursor is not None
+
+    return {
+        "items": rows,
+        "next_cursor": (
+            encode_cursor(*key(rows[-1])) if rows and has_next else None
+        ),
+        "prev_cursor": (
+            encode_cursor(*key(rows[0])) if rows and has_prev else None
+        ),
+    }
+
+
+def export_value(value):
+    """Format a column value for CSV and NDJSON exports"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(header, rows, chunk_size=65536):
+    """Yield a CSV document in chunks of roughly chunk_size characters"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([export_value(value) for value in row])
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(header, rows, chunk_size=65536):
+    """Yield one JSON object per row, in chunks of roughly chunk_size"""
+    chunk = []
+    size = 0
+    for row in rows:
+        line = json.dumps(
+            {key: export_value(value) for key, value in zip(header, row)}
+        ) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+            size = 0
+    yield "".join(chunk)
+
+
+def gzip_stream(chunks):
+    """Gzip a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode())
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,205 @@
+import re
+from sqlalchemy import event, text, column
+from database import db
+
+# asset search index, an FTS5 table on SQLite and a GIN indexed tsvector on
+# Postgres, kept in sync with assets, users and departments by triggers
+
+SEARCH_TERM_REGEX = re.compile(r'\w+')
+
+# written out in full rather than formatted from a shared SELECT, so every
+# statement is a constant
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS asset_search USING fts5(
+        name, description, type, serial_number, owner, department
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS asset_search_insert
+    AFTER INSERT ON assets BEGIN
+        INSERT INTO asset_search (
+            rowid, name, description, type, serial_number, owner, department
+        )
+        SELECT a.id, a.name, a.description, a.type, a.serial_number,
+            u.username, d.name
+        FROM assets a
+        LEFT JOIN users u ON u.id = a.owner_id
+        LEFT JOIN departments d ON d.id = a.department_id
+        WHERE a.id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS asset_search_update
+    AFTER UPDATE ON assets BEGIN
+        DELETE FROM asset_search WHERE rowid = OLD.id;
+        INSERT INTO asset_search (
+            rowid, name, description, type, serial_number, owner, department
+        )
+        SELECT a.id, a.name, a.description, a.type, a.serial_number,
+            u.username, d.name
+        FROM assets a
+        LEFT JOIN users u ON u.id = a.owner_id
+        LEFT JOIN departments d ON d.id = a.department_id
+        WHERE a.id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS asset_search_delete
+    AFTER DELETE ON assets BEGIN
+        DELETE FROM asset_search WHERE rowid = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS asset_search_owner
+    AFTER UPDATE OF username ON users BEGIN
+        UPDATE asset_search SET owner = NEW.username
+        WHERE rowid IN (SELECT id FROM assets WHERE owner_id = NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS asset_search_department
+    AFTER UPDATE OF name ON departments BEGIN
+        UPDATE asset_search SET department = NEW.name
+        WHERE rowid IN (SELECT id FROM assets WHERE department_id = NEW.id);
+    END
+    """,
+]
+
+SQLITE_REBUILD = [
+    "DELETE FROM asset_search",
+    """
+    INSERT INTO asset_search (
+        rowid, name, description, type, serial_number, owner, department
+    )
+    SELECT a.id, a.name, a.description, a.type, a.serial_number,
+        u.username, d.name
+    FROM assets a
+    LEFT JOIN users u ON u.id = a.owner_id
+    LEFT JOIN departments d ON d.id = a.department_id
+    """,
+]
+
+POSTGRES_DOCUMENT = """
+    INSERT INTO asset_search (asset_id, document)
+    SELECT a.id, to_tsvector('simple', concat_ws(' ',
+        a.name, a.description, a.type, a.serial_number, u.username, d.name
+    ))
+    FROM assets a
+    LEFT JOIN users u ON u.id = a.owner_id
+    LEFT JOIN departments d ON d.id = a.department_id
+"""
+
+POSTGRES_UPSERT = (
+    " ON CONFLICT (asset_id) DO UPDATE SET document = EXCLUDED.document"
+)
+
+POSTGRES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS asset_search (
+        asset_id INTEGER PRIMARY KEY
+            REFERENCES assets (id) ON DELETE CASCADE,
+        document TSVECTOR NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_asset_search_document
+    ON asset_search USING GIN (document)
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION asset_search_sync_asset() RETURNS trigger AS $$
+    BEGIN
+        {POSTGRES_DOCUMENT} WHERE a.id = NEW.id {POSTGRES_UPSERT};
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION asset_search_sync_owner() RETURNS trigger AS $$
+    BEGIN
+        {POSTGRES_DOCUMENT} WHERE a.owner_id = NEW.id {POSTGRES_UPSERT};
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION asset_search_sync_department()
+    RETURNS trigger AS $$
+    BEGIN
+        {POSTGRES_DOCUMENT} WHERE a.department_id = NEW.id {POSTGRES_UPSERT};
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE TRIGGER asset_search_asset
+    AFTER INSERT OR UPDATE ON assets
+    FOR EACH ROW EXECUTE FUNCTION asset_search_sync_asset()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER asset_search_owner
+    AFTER UPDATE OF username ON users
+    FOR EACH ROW EXECUTE FUNCTION asset_search_sync_owner()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER asset_search_department
+    AFTER UPDATE OF name ON departments
+    FOR EACH ROW EXECUTE FUNCTION asset_search_sync_department()
+    """,
+]
+
+# the triggers keep writing while this runs, so rows are upserted rather
+# than cleared and reinserted, deleted assets cascade out of the index
+POSTGRES_REBUILD = [
+    POSTGRES_DOCUMENT + POSTGRES_UPSERT,
+]
+
+
+@event.listens_for(db.metadata, "after_create")
+def create_search_index(target, connection, **kw):
+    """Create the search table and its triggers alongside the models"""
+    ddl = POSTGRES_DDL if connection.dialect.name == "postgresql" \
+        else SQLITE_DDL
+    for statement in ddl:
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(db.metadata, "before_drop")
+def drop_search_index(target, connection, **kw):
+    """Drop the search table before the tables it references"""
+    connection.exec_driver_sql("DROP TABLE IF EXISTS asset_search")
+
+
+def rebuild_search_index():
+    """Re-index every asset, for databases created before the index"""
+    dialect = db.session.get_bind().dialect.name
+    statements = POSTGRES_REBUILD if dialect == "postgresql" \
+        else SQLITE_REBUILD
+    for statement in statements:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+
+def search_terms(query):
+    """Split a search string into index terms"""
+    return SEARCH_TERM_REGEX.findall(query or "")
+
+
+def asset_search_ids(query):
+    """Select the ids of assets matching every term of query as a prefix,
+    returns None if the query has no searchable terms"""
+    terms = search_terms(query)
+    if not terms:
+        return None
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        statement = text(
+            "SELECT asset_id FROM asset_search "
+            "WHERE document @@ to_tsquery('simple', :terms)"
+        ).bindparams(terms=" & ".join(f"{term}:*" for term in terms))
+        return statement.columns(column("asset_id"))
+
+    statement = text(
+        "SELECT rowid FROM asset_search WHERE asset_search MATCH :terms"
+    ).bindparams(terms=" AND ".join(f'"{term}"*' for term in terms))
+    return statement.columns(column("rowid"))
@@ -1,8 +1,60 @@
+import argparse
+import csv
+import io
+import random
 from werkzeug.security import generate_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select
 from app import create_app
 from database import db
-from models import User, Department, Asset
+from models import User, Department, Asset, Log
+from cache import reference_cache
+
+# synthetic data for profiling and benchmarks, deterministic for a given
+# seed and end date
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael',
+    'Linda', 'David', 'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan',
+    'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen', 'Aisha',
+    'Mohammed', 'Priya', 'Wei', 'Olga', 'Kwame', 'Sofia', 'Hiroshi',
+]
+LAST_NAMES = [
+    'Smith', 'Jones', 'Taylor', 'Brown', 'Williams', 'Wilson', 'Johnson',
+    'Davies', 'Patel', 'Robinson', 'Wright', 'Thompson', 'Evans', 'Walker',
+    'White', 'Roberts', 'Green', 'Hall', 'Khan', 'Clarke', 'Lewis', 'Nguyen',
+]
+DEPARTMENT_NAMES = [
+    'HR', 'Customer Service', 'IT', 'Store Operations', 'Security',
+    'Marketing', 'Finance', 'Logistics', 'Legal', 'Facilities',
+]
+ASSET_CATALOGUE = {
+    'Laptop': ['Lenovo ThinkPad X1', 'Dell Latitude 5440', 'HP EliteBook 840',
+               'MacBook Pro 14"', 'MacBook Air 13"'],
+    'Desktop': ['Dell OptiPlex 7090', 'HP ProDesk 600', 'Lenovo ThinkCentre'],
+    'Phone': ['iPhone 15', 'iPhone 14', 'Samsung Galaxy S23', 'Pixel 8'],
+    'Tablet': ['iPad Air', 'iPad Pro', 'Samsung Galaxy Tab S8'],
+    'Monitor': ['Dell U2723QE', 'LG 27UL850', 'HP E24 G5'],
+    'Device': ['Zebra TC52', 'Zebra MC3300', 'Honeywell CT40'],
+}
+ASSET_DESCRIPTIONS = {
+    'Laptop': ['Work laptop', 'Development laptop', 'Backup laptop'],
+    'Desktop': ['Office desktop', 'Main office workstation', 'Till PC'],
+    'Phone': ['Company phone', 'On-call phone'],
+    'Tablet': ['Tablet for presentations', 'Tablet for stock check'],
+    'Monitor': ['Desk monitor', 'Second screen'],
+    'Device': ['Inventory scanner', 'Handheld terminal'],
+}
+LOG_ACTIONS = [
+    'Logged in as {username} (ID: {user_id})',
+    'Logged out as {username} (ID: {user_id})',
+    'Assets viewed by {username} (ID: {user_id})',
+    'Departments viewed by {username} (ID: {user_id})',
+    'Asset (ID: {asset_id}, Name: {asset_name}) updated by {username} '
+    '(ID: {user_id})',
+    'Asset (ID: {asset_id}, Name: {asset_name}) created by {username} '
+    '(ID: {user_id})',
+]
 
 
 def init_db():
@@ -141,5 +193,202 @@ def init_db():
         print("Database ingest succesful")
 
 
+def batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def copy_rows(connection, table, columns, rows, batch_size):
+    """COPY rows into a Postgres table with psycopg 3 or psycopg2"""
+    cursor = connection.connection.dbapi_connection.cursor()
+    column_list = ', '.join(columns)
+    if hasattr(cursor, 'copy'):
+        with cursor.copy(
+            f"COPY {table.name} ({column_list}) FROM STDIN"
+        ) as copy:
+            for row in rows:
+                copy.write_row(row)
+        return
+
+    statement = f"COPY {table.name} ({column_list}) FROM STDIN WITH CSV"
+    for batch in batches(rows, batch_size):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        cursor.copy_expert(statement, buffer)
+
+
+def bulk_insert(model, columns, rows, batch_size=10000):
+    """Write tuples of columns into model's table, COPY on Postgres and
+    batched executemany elsewhere"""
+    table = model.__table__
+    with db.engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            copy_rows(connection, table, columns, rows, batch_size)
+            if 'id' in columns:
+                # explicit ids leave the sequence behind
+                connection.execute(select(func.setval(
+                    func.pg_get_serial_sequence(table.name, 'id'),
+                    select(func.coalesce(func.max(table.c.id), 1))
+                    .scalar_subquery()
+                )))
+        else:
+            # executemany straight on the driver, skipping per row
+            # parameter handling in SQLAlchemy
+            compiled = insert(table).compile(
+                dialect=connection.dialect, column_keys=columns
+            )
+            processors = [
+                table.c[name].type.bind_processor(connection.dialect)
+                for name in columns
+            ]
+            order = None
+            if compiled.positional and \
+                    list(compiled.positiontup) != list(columns):
+                order = [columns.index(name) for name in compiled.positiontup]
+            for batch in batches(rows, batch_size):
+                params = [
+                    tuple(
+                        process(value) if process else value
+                        for process, value in zip(processors, row)
+                    )
+                    for row in batch
+                ]
+                if order:
+                    params = [tuple(row[i] for i in order) for row in params]
+                elif not compiled.positional:
+                    params = [dict(zip(columns, row)) for row in params]
+                connection.exec_driver_sql(str(compiled), params)
+
+
+def generate_data(users, assets, logs, seed=1, until=None,
+                  batch_size=10000):
+    """Fill an empty database with users, assets and logs spread over the
+    three years before until. User 1 is admin, every password is
+    'password'"""
+    generator = random.Random(seed)
+    until = until or datetime.now().replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    password_hash = generate_password_hash('password')
+
+    bulk_insert(Department, ['id', 'name'], enumerate(DEPARTMENT_NAMES, 1))
+
+    usernames = ['admin'] + [
+        f"{generator.choice(FIRST_NAMES)}_{generator.choice(LAST_NAMES)}"
+        f"{number}"
+        for number in range(2, users + 1)
+    ]
+    bulk_insert(User, ['id', 'username', 'password_hash', 'role'], (
+        (
+            number, username, password_hash,
+            'Admin' if number == 1 or generator.random() < 0.03 else 'User'
+        )
+        for number, username in enumerate(usernames, 1)
+    ), batch_size)
+
+    asset_names = []
+
+    def asset_rows():
+        for number in range(1, assets + 1):
+            asset_type = generator.choice(list(ASSET_CATALOGUE))
+            name = generator.choice(ASSET_CATALOGUE[asset_type])
+            asset_names.append(name)
+            yield (
+                number,
+                name,
+                generator.choice(ASSET_DESCRIPTIONS[asset_type]),
+                asset_type,
+                f"{asset_type[:3].upper()}-{seed:03d}-{number:09d}",
+                until - timedelta(
+                    seconds=generator.randrange(3 * 365 * 24 * 60 * 60)
+                ),
+                generator.random() < 0.85,
+                generator.random() < 0.97,
+                generator.randint(1, users),
+                generator.randint(1, len(DEPARTMENT_NAMES)),
+            )
+
+    bulk_insert(Asset, [
+        'id', 'name', 'description', 'type', 'serial_number', 'date_created',
+        'in_use', 'approved', 'owner_id', 'department_id'
+    ], asset_rows(), batch_size)
+
+    # logs are written in time order like the real thing, with their
+    # indexes built once afterwards rather than maintained row by row
+    start = until - timedelta(days=365)
+    step = timedelta(days=365) / max(logs, 1)
+
+    def log_rows():
+        # the hot loop for millions of rows, so random() over randint()
+        random_fraction = generator.random
+        for number in range(logs):
+            user_id = int(random_fraction() * users) + 1
+            asset_id = int(random_fraction() * max(assets, 1)) + 1
+            action = LOG_ACTIONS[int(random_fraction() * len(LOG_ACTIONS))]
+            yield (
+                user_id,
+                action.format(
+                    username=usernames[user_id - 1],
+                    user_id=user_id,
+                    asset_id=asset_id,
+                    asset_name=asset_names[asset_id - 1]
+                    if asset_names else '',
+                ),
+                start + step * number,
+            )
+
+    with db.engine.begin() as connection:
+        for index in Log.__table__.indexes:
+            index.drop(connection)
+    bulk_insert(Log, ['user_id', 'action', 'timestamp'], log_rows(),
+                batch_size)
+    with db.engine.begin() as connection:
+        for index in Log.__table__.indexes:
+            index.create(connection)
+    # written behind the routes' backs
+    reference_cache.bump('departments', 'users', 'assets')
+
+
+def generate_db(users, assets, logs, seed=1, until=None):
+    app = create_app()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generate_data(users, assets, logs, seed, until)
+        print(
+            f"Generated {users} users, {assets} assets and {logs} logs "
+            f"with seed {seed}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create the database with sample data, or generate a "
+                    "large synthetic dataset"
+    )
+    parser.add_argument('--users', type=int, default=None)
+    parser.add_argument('--assets', type=int, default=0)
+    parser.add_argument('--logs', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--until', type=datetime.fromisoformat, default=None,
+                        help="latest timestamp to generate, default today")
+    args = parser.parse_args()
+
+    if args.users is None:
+        init_db()
+    else:
+        generate_db(
+            max(args.users, 1), args.assets, args.logs, args.seed, args.until
+        )
+
+
 if __name__ == '__main__':
-    init_db()
+    main()
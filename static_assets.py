@@ -0,0 +1,50 @@
+import hashlib
+import os
+from flask import request
+
+# static urls carry a hash of the file's contents, so browsers can cache
+# them forever and still see a new version as soon as it is deployed
+
+FAR_FUTURE = "public, max-age=31536000, immutable"
+
+
+class StaticFingerprints:
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._hashes = {}
+
+    def get(self, filename):
+        """Content hash for a static file, None if it doesn't exist"""
+        path = os.path.join(self.static_folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._hashes.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        self._hashes[filename] = (mtime, digest)
+        return digest
+
+
+def init_static_assets(app):
+    fingerprints = StaticFingerprints(app.static_folder)
+
+    @app.url_defaults
+    def add_fingerprint(endpoint, values):
+        if endpoint == "static" and "v" not in values:
+            digest = fingerprints.get(values.get("filename", ""))
+            if digest:
+                values["v"] = digest
+
+    @app.after_request
+    def cache_static(response):
+        if (
+            request.endpoint == "static"
+            and "v" in request.args
+            and response.status_code == 200
+        ):
+            response.headers["Cache-Control"] = FAR_FUTURE
+        return response
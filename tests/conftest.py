@@ -1,15 +1,22 @@
 import pytest
+from contextlib import contextmanager
 from database import db
 from app import create_app
 from datetime import datetime, timezone
 from werkzeug.security import generate_password_hash
 from models import User, Department, Asset, Log
+from cache import metrics_cache, identity_cache, reference_cache
+from query_budget import query_tracker
 
 
 class TestConfig:
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     WTF_CSRF_ENABLED = False
+    AUDIT_LOG_ASYNC = False
+    PASSWORD_HASH_WORKERS = 0
+    RATE_LIMIT_ENABLED = False
+    PROXY_FIX_X_FOR = 1
 
 
 @pytest.fixture(scope="session")
@@ -26,6 +33,36 @@ def client(app):
     return app.test_client()
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # seed fixtures rebuild the database behind the routes' backs
+    metrics_cache.invalidate()
+    identity_cache.invalidate()
+    reference_cache.clear()
+
+
+@pytest.fixture
+def max_queries():
+    """with max_queries(n): fails if any request in the block runs more
+    than n queries"""
+    @contextmanager
+    def check(limit):
+        reports = []
+        query_tracker.reporters.append(reports.append)
+        try:
+            yield reports
+        finally:
+            query_tracker.reporters.remove(reports.append)
+        for report in reports:
+            assert report["queries"] <= limit, (
+                f"{report['endpoint']} ran {report['queries']} queries, "
+                f"more than {limit}: "
+                f"{report['fingerprints'].most_common(3)}"
+            )
+
+    return check
+
+
 @pytest.fixture(scope="module")
 def seed_assets(app):
     with app.app_context():
@@ -0,0 +1,74 @@
+from utils import login_as_admin, login_as_user
+
+
+def test_api_requires_login(client, seed_assets):
+    response = client.get("/api/v1/assets")
+    assert response.status_code == 401
+
+
+def test_api_assets(client, seed_assets):
+    login_as_admin(client)
+    response = client.get("/api/v1/assets?fields=id,name&per_page=2")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [set(item) for item in data["items"]] == [{"id", "name"}] * 2
+    assert data["next_cursor"] is not None
+
+    response = client.get(
+        f"/api/v1/assets?fields=id,name&after={data['next_cursor']}"
+    )
+    assert response.get_json()["items"][0]["name"] == "Windows 10 PC"
+
+
+def test_api_unknown_field(client, seed_assets):
+    login_as_admin(client)
+    response = client.get("/api/v1/users?fields=password_hash")
+    assert response.status_code == 400
+
+
+def test_api_etag(client, seed_assets):
+    login_as_admin(client)
+    response = client.get("/api/v1/departments")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert not etag.startswith("W/")
+
+    response = client.get(
+        "/api/v1/departments", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.data == b""
+
+    client.post("/department/create", data={"name": "API"})
+    response = client.get(
+        "/api/v1/departments", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert "API" in [item["name"] for item in response.get_json()["items"]]
+
+
+def test_api_etag_checked_before_listing(client, seed_assets, max_queries):
+    login_as_admin(client)
+    etag = client.get("/api/v1/assets").headers["ETag"]
+
+    with max_queries(3) as reports:
+        response = client.get(
+            "/api/v1/assets", headers={"If-None-Match": etag}
+        )
+    assert response.status_code == 304
+    assert not any(
+        "FROM assets" in statement for statement in reports[0]["fingerprints"]
+    )
+
+    client.post("/asset/approve/2")
+    response = client.get("/api/v1/assets", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_api_users_scoped(client, seed_assets):
+    login_as_user(client)
+    response = client.get("/api/v1/users")
+    assert [item["username"] for item in response.get_json()["items"]] == [
+        "user"
+    ]
@@ -1,4 +1,11 @@
-from models import Asset, Log
+import csv
+import io
+import json
+import re
+from database import db
+from models import Asset, Department, Log
+import routes.assets as assets_routes
+from audit import audit_log
 from utils import login_as_admin, login_as_user
 
 
@@ -8,6 +15,10 @@ def test_assets_page_loads(client, seed_assets):
 
     assert response.status_code == 200
     assert b"Create New Asset" in response.data
+    # owner and department options are fetched on demand
+    assert b'<datalist id="owner_options"></datalist>' in response.data
+    assert b"Select user" not in response.data
+    assert b"Select department" not in response.data
 
 
 def test_asset_edit(client, seed_assets):
@@ -143,3 +154,286 @@ def test_asset_approve(client, seed_assets):
         f"Asset (ID: {asset_id}, Name: {asset_name}) approved by"
         in log.action
     )
+
+
+def test_assets_paginated(client, seed_assets):
+    login_as_admin(client)
+
+    response = client.get("/assets?sort=name&order=asc&per_page=1")
+    assert response.status_code == 200
+    assert b"Lenovo XP5 15" in response.data
+    assert b"Windows 10 PC" not in response.data
+
+    cursor = re.search(rb"after=([\w%-]+)", response.data).group(1)
+    response = client.get(
+        f"/assets?sort=name&order=asc&per_page=1&after={cursor.decode()}"
+    )
+    assert response.status_code == 200
+    assert b"Windows 10 PC" in response.data
+    assert b"Lenovo XP5 15" not in response.data
+    assert b"Previous" in response.data
+
+
+def test_assets_invalid_cursor(client, seed_assets):
+    login_as_admin(client)
+
+    response = client.get(
+        "/assets?sort=name&order=asc&per_page=1&after=not-a-cursor"
+    )
+    assert response.status_code == 200
+    assert b"Lenovo XP5 15" in response.data
+
+
+def test_assets_search(client, seed_assets):
+    login_as_admin(client)
+
+    response = client.get("/assets?q=windows")
+    assert response.status_code == 200
+    assert b"Windows 10 PC" in response.data
+    assert b"Lenovo XP5 15" not in response.data
+
+
+def test_assets_search_endpoint(client, seed_assets):
+    login_as_admin(client)
+
+    response = client.get("/assets/search?q=SN123")
+    assert response.status_code == 200
+    names = [asset["name"] for asset in response.get_json()["results"]]
+    assert "Lenovo XP5 15" in names
+    assert "Windows 10 PC" not in names
+
+    response = client.get("/assets/search?q=customer service")
+    names = [asset["name"] for asset in response.get_json()["results"]]
+    assert names == ["Windows 10 PC"]
+
+
+def test_assets_search_follows_updates(client, seed_assets):
+    login_as_admin(client)
+
+    client.post("/user/edit/2", data={
+        "username": "searchable_owner",
+        "password": "[HIDDEN]",
+        "role": "User"
+    })
+    response = client.get("/assets/search?q=searchable")
+    assert len(response.get_json()["results"]) > 0
+
+    client.post("/user/edit/2", data={
+        "username": "user",
+        "password": "[HIDDEN]",
+        "role": "User"
+    })
+    response = client.get("/assets/search?q=searchable")
+    assert response.get_json()["results"] == []
+
+
+def test_assets_import(client, seed_assets):
+    login_as_admin(client)
+
+    csv_data = (
+        "name,description,type,serial_number,owner,department,approved\n"
+        "Imported laptop,Bulk,Laptop,SNIMPORT0001,user,IT,yes\n"
+        "Imported phone,,Phone,SNIMPORT0002,admin,Customer Service,\n"
+        "Bad department,,Phone,SNIMPORT0003,user,Nowhere,\n"
+        "Repeated serial,,Phone,SNIMPORT0001,user,IT,\n"
+        "Existing serial,,Phone,SN12345AL32323jjjj,user,IT,\n"
+    )
+    response = client.post(
+        "/assets/import",
+        data={"file": (io.BytesIO(csv_data.encode()), "assets.csv")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report["imported"] == 2
+    assert report["rejected"] == 3
+    assert [row["line"] for row in report["errors"]] == [4, 5, 6]
+
+    asset = Asset.query.filter_by(serial_number="SNIMPORT0001").first()
+    assert asset is not None
+    assert asset.approved is True
+    log = Log.query.filter(
+        Log.action.contains("2 assets imported by admin")
+    ).first()
+    assert log is not None
+
+
+def test_assets_import_ambiguous_department(client, seed_assets):
+    login_as_admin(client)
+    duplicate = Department(name="IT")
+    db.session.add(duplicate)
+    db.session.commit()
+
+    csv_data = (
+        "name,serial_number,owner,department\n"
+        "Ambiguous,SNIMPORTDUP1,user,IT\n"
+        "Clear,SNIMPORTDUP2,user,Customer Service\n"
+    )
+    response = client.post(
+        "/assets/import",
+        data={"file": (io.BytesIO(csv_data.encode()), "assets.csv")},
+        content_type="multipart/form-data",
+    )
+    report = response.get_json()
+    assert report["imported"] == 1
+    assert report["errors"] == [{"line": 2, "errors": [
+        "department name 'IT' matches more than one department"
+    ]}]
+    assert Asset.query.filter_by(serial_number="SNIMPORTDUP1").count() == 0
+
+    db.session.delete(duplicate)
+    db.session.commit()
+
+
+def test_assets_import_conflict_names_lines(client, seed_assets,
+                                            monkeypatch):
+    login_as_admin(client)
+    # as if another request created the serial after it was checked
+    monkeypatch.setattr(assets_routes, "existing_serials", lambda _: set())
+
+    csv_data = (
+        "name,serial_number,owner,department\n"
+        "New,SNIMPORTRACE1,user,IT\n"
+        "Taken,SN12345AL32323jjjj,user,IT\n"
+        "Also new,SNIMPORTRACE2,user,IT\n"
+    )
+    response = client.post(
+        "/assets/import",
+        data={"file": (io.BytesIO(csv_data.encode()), "assets.csv")},
+        content_type="multipart/form-data",
+    )
+    report = response.get_json()
+    assert report["imported"] == 2
+    assert report["errors"] == [
+        {"line": 3, "errors": ["conflicts with an existing asset"]}
+    ]
+    assert Asset.query.filter(
+        Asset.serial_number.in_(["SNIMPORTRACE1", "SNIMPORTRACE2"])
+    ).count() == 2
+
+
+def test_assets_import_missing_columns(client, seed_assets):
+    login_as_admin(client)
+
+    response = client.post(
+        "/assets/import",
+        data={"file": (io.BytesIO(b"name,type\nx,Phone\n"), "assets.csv")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 400
+    assert "department" in response.get_json()["error"]
+
+
+def test_assets_import_user_scoped(client, seed_assets):
+    login_as_user(client)
+
+    csv_data = (
+        "name,serial_number,owner,department,approved\n"
+        "Own asset,SNIMPORTUSER1,,IT,yes\n"
+        "Someone elses,SNIMPORTUSER2,admin,IT,\n"
+    )
+    response = client.post(
+        "/assets/import",
+        data={"file": (io.BytesIO(csv_data.encode()), "assets.csv")},
+        content_type="multipart/form-data",
+    )
+    report = response.get_json()
+    assert report["imported"] == 1
+    assert report["errors"][0]["line"] == 3
+
+    asset = Asset.query.filter_by(serial_number="SNIMPORTUSER1").first()
+    assert asset.owner.username == "user"
+    assert asset.approved is False
+
+
+def test_assets_export_csv(client, seed_assets):
+    login_as_admin(client)
+
+    response = client.get("/assets/export.csv")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == Asset.query.count()
+    assert {"Lenovo XP5 15", "Windows 10 PC"} <= {row["name"] for row in rows}
+
+
+def test_assets_export_ndjson_scoped(client, seed_assets):
+    login_as_user(client)
+
+    response = client.get("/assets/export.ndjson")
+    assert response.status_code == 200
+    rows = [
+        json.loads(line)
+        for line in response.get_data(as_text=True).splitlines()
+    ]
+    assert len(rows) == Asset.query.filter_by(owner_id=2).count()
+    assert {row["owner_username"] for row in rows} == {"user"}
+
+
+def test_bulk_approve_user_forbidden(client, seed_assets):
+    login_as_user(client)
+
+    pending = Asset.query.filter_by(approved=False).first()
+    response = client.post(
+        "/assets/approve", data={"asset_ids": [pending.id]}
+    )
+    assert response.status_code == 302
+    assert Asset.query.filter_by(id=pending.id).first().approved is False
+    log = Log.query.filter(
+        Log.action.contains("Bulk asset approve attempted by user")
+    ).first()
+    assert log is not None
+
+
+def test_bulk_approve_and_reject(client, seed_assets):
+    login_as_admin(client)
+
+    pending = [
+        asset.id for asset in Asset.query.filter_by(approved=False)
+    ]
+    assert len(pending) >= 2
+    approved_id, rejected_id = pending[0], pending[1]
+
+    response = client.post(
+        "/assets/approve",
+        data={"asset_ids": [approved_id, 1]},
+        follow_redirects=True
+    )
+    assert b"1 assets approved" in response.data
+    assert db.session.get(Asset, approved_id).approved is True
+
+    response = client.post(
+        "/assets/approve",
+        data={"asset_ids": [rejected_id], "action": "reject"},
+        follow_redirects=True
+    )
+    assert b"1 assets rejected" in response.data
+    assert db.session.get(Asset, rejected_id) is None
+    log = Log.query.filter(
+        Log.action.contains(f"Asset (ID: {rejected_id}, Name:")
+        & Log.action.contains("rejected by admin")
+    ).first()
+    assert log is not None
+
+
+def test_bulk_approve_all_pending(client, seed_assets, monkeypatch):
+    login_as_admin(client)
+    # audit rows for bulk changes must not go through the droppable queue
+    queued = []
+    monkeypatch.setattr(audit_log, "enabled", True)
+    monkeypatch.setattr(
+        audit_log, "write", lambda user_id, action: queued.append(action)
+    )
+
+    remaining = Asset.query.filter_by(approved=False).count()
+    assert remaining
+    logged = Log.query.filter(Log.action.contains(") approved by")).count()
+    response = client.post(
+        "/assets/approve", data={"all_pending": "1"}, follow_redirects=True
+    )
+    assert f"{remaining} assets approved".encode() in response.data
+    assert Asset.query.filter_by(approved=False).count() == 0
+    assert Log.query.filter(
+        Log.action.contains(") approved by")
+    ).count() == logged + remaining
+    assert not [action for action in queued if "approved by" in action]
@@ -0,0 +1,38 @@
+from prometheus_client import REGISTRY
+from audit import AuditLogWriter
+from models import Log
+
+
+def test_audit_writer_flushes_on_stop(app, seed_logs):
+    writer = AuditLogWriter(app)
+    writer.write(1, "Queued action 1")
+    writer.write(1, "Queued action 2")
+    writer.stop()
+
+    assert writer.stats()["written"] == 2
+    assert writer.stats()["queued"] == 0
+    log = Log.query.filter(
+        Log.action.contains("Queued action 2")
+    ).first()
+    assert log is not None
+    assert log.user_id == 1
+
+
+def test_audit_writer_drops_when_full(app, seed_logs, monkeypatch):
+    writer = AuditLogWriter(app)
+    writer.queue_size = 1
+    monkeypatch.setattr(writer, "_run", lambda: None)
+    dropped = REGISTRY.get_sample_value("itam_audit_log_dropped_total")
+
+    writer.write(1, "Kept action")
+    writer.write(1, "Dropped action")
+    writer.write(1, "Dropped action")
+    assert writer.stats()["dropped"] == 2
+    assert REGISTRY.get_sample_value(
+        "itam_audit_log_dropped_total"
+    ) == dropped + 2
+
+    writer.flush()
+    assert writer.stats()["written"] == 1
+    assert Log.query.filter(Log.action == "Kept action").count() == 1
+    assert Log.query.filter(Log.action == "Dropped action").count() == 0
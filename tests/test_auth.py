@@ -1,5 +1,10 @@
-from utils import login_as_user
+from contextlib import contextmanager
+from flask import session
+from sqlalchemy import event
+from database import db
+from utils import login_as_user, login_as_admin
 from models import Log
+from routes.utils import current_user, admin_required
 
 
 def test_login_page_loads(client, seed_auth):
@@ -95,3 +100,65 @@ def test_logout(client, seed_auth):
     )
     assert log is not None
     assert "Logged out" in log.action
+
+
+@contextmanager
+def count_statements(engine):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def test_current_user_memoised_per_request(app, seed_auth):
+    with app.test_request_context():
+        session["user_id"] = 2
+        first = current_user()
+        with count_statements(db.engine) as statements:
+            assert current_user() is first
+            assert admin_required(lambda: "ok")().status_code == 302
+        assert statements == []
+
+
+def test_identity_cache(app, seed_auth):
+    app.config["IDENTITY_CACHE_TTL"] = 60
+    try:
+        with app.test_request_context():
+            session["user_id"] = 2
+            assert current_user().username == "user"
+
+        db.session.expunge_all()
+        with app.test_request_context():
+            session["user_id"] = 2
+            with count_statements(db.engine) as statements:
+                user = current_user()
+                assert user.username == "user"
+                assert user in db.session
+            assert statements == []
+    finally:
+        app.config["IDENTITY_CACHE_TTL"] = 0
+
+
+def test_identity_cache_invalidated_on_promote(client, app, seed_auth):
+    app.config["IDENTITY_CACHE_TTL"] = 60
+    try:
+        login_as_user(client)
+        response = client.get("/dashboard")
+        assert b"Role: User" in response.data
+
+        client.post("/logout")
+        login_as_admin(client)
+        client.post("/user/promote/2")
+        client.post("/logout")
+
+        login_as_user(client)
+        response = client.get("/dashboard")
+        assert b"Role: Admin" in response.data
+    finally:
+        app.config["IDENTITY_CACHE_TTL"] = 0
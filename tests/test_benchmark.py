@@ -0,0 +1,37 @@
+from benchmark import percentile, summarise, compare
+
+
+def test_percentile_nearest_rank():
+    samples = [float(number) for number in range(1, 101)]
+    assert percentile(samples, 0.50) == 50.0
+    assert percentile(samples, 0.95) == 95.0
+    assert percentile(samples, 0.99) == 99.0
+    assert percentile([0.2], 0.99) == 0.2
+    assert percentile([], 0.5) == 0.0
+
+
+def test_summarise():
+    summary = summarise([0.01] * 9 + [0.1], errors=2, elapsed=2.0)
+    assert summary == {
+        "requests": 12,
+        "errors": 2,
+        "throughput_rps": 6.0,
+        "p50_ms": 10.0,
+        "p95_ms": 100.0,
+        "p99_ms": 100.0,
+    }
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {
+        "/assets": {"p95_ms": 100.0, "throughput_rps": 50.0, "errors": 0},
+        "/logs": {"p95_ms": 100.0, "throughput_rps": 50.0, "errors": 0},
+    }
+    results = {
+        "/assets": {"p95_ms": 115.0, "throughput_rps": 45.0, "errors": 0},
+        "/logs": {"p95_ms": 130.0, "throughput_rps": 30.0, "errors": 1},
+        "/new": {"p95_ms": 999.0, "throughput_rps": 1.0, "errors": 0},
+    }
+    regressions = compare(results, baseline, tolerance=0.2)
+    assert len(regressions) == 3
+    assert all(regression.startswith("/logs") for regression in regressions)
@@ -0,0 +1,79 @@
+import gzip
+import re
+import pytest
+from utils import login_as_admin
+
+
+def test_html_gzipped(client, seed_assets):
+    login_as_admin(client)
+    response = client.get("/assets", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert b"Create New Asset" in gzip.decompress(response.data)
+
+
+def test_html_brotli(client, seed_assets):
+    brotli = pytest.importorskip("brotli")
+    login_as_admin(client)
+    response = client.get(
+        "/assets", headers={"Accept-Encoding": "gzip, br"}
+    )
+    assert response.headers["Content-Encoding"] == "br"
+    assert b"Create New Asset" in brotli.decompress(response.data)
+
+
+def test_refused_encodings_not_used(client, seed_assets):
+    login_as_admin(client)
+    response = client.get(
+        "/assets", headers={"Accept-Encoding": "gzip, br;q=0"}
+    )
+    assert response.headers["Content-Encoding"] == "gzip"
+
+    response = client.get(
+        "/assets", headers={"Accept-Encoding": "gzip;q=0, identity"}
+    )
+    assert "Content-Encoding" not in response.headers
+    assert b"Create New Asset" in response.data
+
+
+def test_small_responses_not_compressed(client, seed_assets):
+    response = client.get(
+        "/api/v1/assets", headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 401
+    assert "Content-Encoding" not in response.headers
+
+
+def test_no_compression_without_accept_encoding(client, seed_assets):
+    login_as_admin(client)
+    response = client.get("/assets", headers={"Accept-Encoding": ""})
+    assert "Content-Encoding" not in response.headers
+    assert b"Create New Asset" in response.data
+
+
+def test_compressed_etag_still_conditional(client, seed_assets):
+    login_as_admin(client)
+    response = client.get(
+        "/api/v1/assets", headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.headers["Content-Encoding"] == "gzip"
+    etag = response.headers["ETag"]
+    assert etag.startswith("W/")
+    response = client.get(
+        "/api/v1/assets",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+
+def test_static_urls_fingerprinted(client, seed_assets):
+    response = client.get("/login")
+    url = re.search(
+        rb'href="(/static/css/style\.css\?v=[0-9a-f]{12})"', response.data
+    ).group(1).decode()
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "max-age=31536000" in response.headers["Cache-Control"]
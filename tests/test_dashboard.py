@@ -1,3 +1,7 @@
+from sqlalchemy import event
+from database import db
+from models import Asset, User, Department
+from routes.dashboard import dashboard_metrics
 from utils import login_as_admin, login_as_user
 
 
@@ -35,3 +39,61 @@ def test_role_loads_as_user(client, seed_dashboard):
     response = client.get("/dashboard", follow_redirects=True)
     assert response.status_code == 200
     assert b"Role: User" in response.data
+
+
+def test_metrics_cached(client, seed_dashboard):
+    login_as_admin(client)
+    response = client.get("/dashboard")
+    assert b'<p class="metrics-text">3</p>' in response.data
+
+    # written behind the routes' backs so the cache is not invalidated
+    db.session.add(Asset(
+        name="Uncached asset", serial_number="SNUNCACHED0001",
+        owner_id=2, department_id=1
+    ))
+    db.session.commit()
+    response = client.get("/dashboard")
+    assert b'<p class="metrics-text">3</p>' in response.data
+    assert b'<p class="metrics-text">4</p>' not in response.data
+
+    Asset.query.filter_by(name="Uncached asset").delete()
+    db.session.commit()
+
+
+def test_metrics_invalidated_by_routes(client, seed_dashboard):
+    login_as_admin(client)
+    response = client.get("/dashboard")
+    assert b'<p class="metrics-text">3</p>' in response.data
+
+    client.post("/asset/create", data={
+        "name": "Cache test asset",
+        "description": "test",
+        "type": "Phone",
+        "serial_number": "SNCACHE0001",
+        "in_use": "1",
+        "department_id": "1",
+        "assigned_user_id": "2",
+    })
+    response = client.get("/dashboard")
+    assert b'<p class="metrics-text">4</p>' in response.data
+
+
+def test_metrics_single_query(app, seed_dashboard):
+    statements = []
+
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count_statement)
+    try:
+        metrics = dashboard_metrics()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count_statement)
+
+    assert len(statements) == 1
+    assert metrics == {
+        "total_assets": Asset.query.count(),
+        "pending_assets": Asset.query.filter_by(approved=False).count(),
+        "total_users": User.query.count(),
+        "total_departments": Department.query.count(),
+    }
@@ -0,0 +1,87 @@
+import pytest
+from flask import Flask
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError
+from database import db
+from db_pool import engine_options_from_env, TimedQueuePool, pool_monitor
+from utils import login_as_admin, login_as_user
+
+
+def test_engine_options_from_env():
+    options = engine_options_from_env(
+        "postgresql://localhost/itam",
+        {"DB_POOL_SIZE": "20", "DB_MAX_OVERFLOW": "5",
+         "DB_POOL_TIMEOUT": "10", "DB_POOL_PRE_PING": "0"}
+    )
+    assert options == {
+        "pool_pre_ping": False,
+        "pool_recycle": 1800,
+        "poolclass": TimedQueuePool,
+        "pool_size": 20,
+        "max_overflow": 5,
+        "pool_timeout": 10,
+    }
+
+
+def test_in_memory_sqlite_keeps_its_pool():
+    options = engine_options_from_env(
+        "sqlite:///:memory:", {"DB_POOL_SIZE": "20"}
+    )
+    assert "poolclass" not in options
+    assert "pool_size" not in options
+
+
+def sample(name):
+    return REGISTRY.get_sample_value(name) or 0
+
+
+def test_pool_wait_and_timeout_stats(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path}/pool.db"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options_from_env(
+        app.config["SQLALCHEMY_DATABASE_URI"],
+        {"DB_POOL_SIZE": "1", "DB_MAX_OVERFLOW": "0",
+         "DB_POOL_TIMEOUT": "1"}
+    )
+    db.init_app(app)
+    monitored_app = pool_monitor.app
+    try:
+        pool_monitor.init_app(app)
+        pool_monitor.reset()
+        waits = sample("itam_db_pool_wait_seconds_count")
+        timeouts = sample("itam_db_pool_timeouts_total")
+        with app.app_context():
+            engine = db.engine
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            assert pool_monitor.stats()["checkedout"] == 1
+            assert sample("itam_db_pool_checked_out") == 1
+            assert sample("itam_db_pool_size") == 1
+            with pytest.raises(TimeoutError):
+                engine.connect()
+        assert sample("itam_db_pool_checked_out") == 0
+        assert sample("itam_db_pool_overflow") == 0
+        assert sample("itam_db_pool_wait_seconds_count") == waits + 2
+        assert sample("itam_db_pool_timeouts_total") == timeouts + 1
+
+        stats = pool_monitor.stats()
+        assert stats["checkedout"] == 0
+        assert stats["connect"] == 1
+        assert stats["checkout"] == 1
+        assert stats["waits"] == 2
+        assert stats["timeouts"] == 1
+        assert stats["max_wait_seconds"] >= 0.9
+        engine.dispose()
+    finally:
+        pool_monitor.app = monitored_app
+
+
+def test_pool_endpoint_admin_only(client, seed_auth):
+    login_as_user(client)
+    assert client.get('/api/v1/pool').status_code == 403
+
+    login_as_admin(client)
+    response = client.get('/api/v1/pool')
+    assert response.status_code == 200
+    assert "checkout" in response.get_json()
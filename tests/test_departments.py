@@ -1,5 +1,7 @@
 from utils import login_as_admin, login_as_user
-from models import Log
+from database import db
+from models import Log, Department
+from cache import reference_cache, VersionedCache
 
 
 def test_departments_page_loads(client, seed_departments):
@@ -80,3 +82,62 @@ def test_department_user_can_not_add(client, seed_departments):
     ).order_by(Log.timestamp.desc()).first()
     assert log is not None
     assert "Unauthorised department creation attempt" in log.action
+
+
+def test_department_search(client, seed_departments):
+    login_as_user(client)
+    response = client.get("/departments/search?q=s")
+    assert response.status_code == 200
+    names = [match["name"] for match in response.get_json()["results"]]
+    assert names == ["Security", "Store Operations"]
+
+    response = client.get("/departments/search?q=NEW%20d&limit=1")
+    assert [
+        match["name"] for match in response.get_json()["results"]
+    ] == ["new department"]
+    assert client.get("/departments/search?q=").get_json() == {"results": []}
+    assert client.get("/departments/search?q=%25").get_json() == {
+        "results": []
+    }
+
+
+def test_departments_cached(client, seed_departments):
+    login_as_admin(client)
+    client.get("/departments")
+
+    # written behind the routes' backs so the version is not bumped
+    db.session.add(Department(name="Uncached department"))
+    db.session.commit()
+    response = client.get("/departments")
+    assert b"Uncached department" not in response.data
+    assert reference_cache.hits >= 1
+
+    client.post("/department/create", data={"name": "Cached department"})
+    response = client.get("/departments")
+    assert b"Uncached department" in response.data
+    assert b"Cached department" in response.data
+
+
+def test_departments_cache_sees_other_workers(client, seed_departments):
+    login_as_admin(client)
+    client.get("/departments")
+    db.session.add(Department(name="Other worker department"))
+    db.session.commit()
+
+    # another worker's bump only reaches this one when versions are re-read
+    VersionedCache().bump("departments")
+    reference_cache.check_interval = 0
+    try:
+        response = client.get("/departments")
+    finally:
+        reference_cache.check_interval = 1.0
+    assert b"Other worker department" in response.data
+
+
+def test_reference_cache_bounded(app, seed_departments):
+    cache = VersionedCache(max_entries=2)
+    for key in range(3):
+        assert cache.get("departments", key, lambda: key) == key
+    assert cache.get("departments", 2, lambda: None) == 2
+    assert cache.get("departments", 0, lambda: "reloaded") == "reloaded"
+    assert (cache.hits, cache.misses) == (1, 4)
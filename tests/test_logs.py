@@ -1,3 +1,8 @@
+import csv
+import gzip
+import io
+import json
+from models import Log
 from utils import login_as_admin, login_as_user
 
 
@@ -14,3 +19,60 @@ def test_logs_page_loads_user(client, seed_logs):
     response = client.get("/logs", follow_redirects=True)
     assert response.status_code == 200
     assert b"dashboard" in response.data
+
+
+def test_logs_filter_by_user(client, seed_logs):
+    login_as_admin(client)
+    response = client.get("/logs?user_id=2")
+    assert response.status_code == 200
+    assert b"Logged in as user (ID:2)" in response.data
+    assert b"Logged in as admin (ID:1)" not in response.data
+
+
+def test_logs_filter_by_time_window(client, seed_logs):
+    login_as_admin(client)
+    response = client.get("/logs?start=2000-01-01T00:00&end=2000-01-02T00:00")
+    assert response.status_code == 200
+    assert b"No logs found." in response.data
+
+
+def test_logs_paginated(client, seed_logs):
+    login_as_admin(client)
+    response = client.get("/logs?user_id=1&per_page=1")
+    assert response.status_code == 200
+    assert b"Older" in response.data
+    assert b"user_id=1" in response.data
+    assert b"start=" not in response.data
+
+
+def test_logs_export_csv(client, seed_logs):
+    login_as_admin(client)
+    response = client.get("/logs/export.csv?user_id=2")
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert "Logged in as user (ID:2)" in [row["action"] for row in rows]
+    assert {row["user_id"] for row in rows} == {"2"}
+
+
+def test_logs_export_ndjson_gzip(client, seed_logs):
+    login_as_admin(client)
+    response = client.get("/logs/export.ndjson.gz?end=2999-01-01T00:00")
+    assert response.status_code == 200
+    assert response.mimetype == "application/gzip"
+    rows = [
+        json.loads(line)
+        for line in gzip.decompress(response.data).decode().splitlines()
+    ]
+    assert "Logged in as admin (ID:1)" in [row["action"] for row in rows]
+
+
+def test_logs_export_user(client, seed_logs):
+    login_as_user(client)
+    response = client.get("/logs/export.csv")
+    assert response.status_code == 302
+    assert response.location.endswith("/dashboard")
+
+    log = Log.query.filter(
+        Log.action.contains("Unauthorised logs export attempt")
+    ).first()
+    assert log is not None
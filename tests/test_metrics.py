@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+from prometheus_client.parser import text_string_to_metric_families
+from utils import login_as_admin
+
+
+def sample_values(client, name):
+    """{labels: value} for one sample name scraped from /metrics"""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    return {
+        tuple(sorted(sample.labels.items())): sample.value
+        for family in text_string_to_metric_families(response.data.decode())
+        for sample in family.samples
+        if sample.name == name
+    }
+
+
+def test_requests_are_counted_per_endpoint(client, seed_assets):
+    login_as_admin(client)
+    key = (
+        ('endpoint', 'assets.assets'), ('method', 'GET'), ('status', '200')
+    )
+    before = sample_values(client, 'itam_http_requests_total').get(key, 0)
+
+    client.get('/assets')
+    client.get('/assets')
+
+    client.get('/no-such-page')
+
+    after = sample_values(client, 'itam_http_requests_total')
+    assert after[key] == before + 2
+    # unknown URLs share one label rather than one per path
+    assert after[
+        (('endpoint', 'unmatched'), ('method', 'GET'), ('status', '302'))
+    ] >= 1
+
+
+def test_latency_size_and_db_histograms(client, seed_assets):
+    login_as_admin(client)
+    client.get('/assets')
+
+    latency = sample_values(client, 'itam_http_request_duration_seconds_count')
+    assert latency[(('endpoint', 'assets.assets'), ('method', 'GET'))] >= 1
+    sizes = sample_values(client, 'itam_http_response_size_bytes_sum')
+    assert sizes[(('endpoint', 'assets.assets'),)] > 0
+    queries = sample_values(client, 'itam_db_queries_per_request_sum')
+    assert queries[(('endpoint', 'assets.assets'),)] >= 1
+    in_flight = sample_values(client, 'itam_http_requests_in_flight')
+    assert in_flight[(('endpoint', 'assets.assets'),)] == 0
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setenv('METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    response = client.get(
+        '/metrics', headers={'Authorization': 'Bearer secret'}
+    )
+    assert response.status_code == 200
+
+
+def test_gunicorn_config_prepares_multiprocess_dir(tmp_path):
+    # the config runs before the preloaded app imports prometheus_client
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    directory = tmp_path / "metrics"
+    result = subprocess.run(
+        [sys.executable, "-c",
+         "import runpy; runpy.run_path('gunicorn.conf.py'); import metrics"],
+        cwd=root, capture_output=True, text=True,
+        env=dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(directory)),
+    )
+    assert result.returncode == 0, result.stderr
+    assert any(path.suffix == ".db" for path in directory.iterdir())
@@ -0,0 +1,76 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql
+from database import db
+from migrate import (
+    migrate_indexes, migrate_search_index, partitioned_index_statements
+)
+from search import asset_search_ids
+from models import Asset, Log
+
+
+def index_names(table):
+    return {index["name"] for index in inspect(db.engine).get_indexes(table)}
+
+
+def test_migrate_creates_missing_indexes(app, seed_assets):
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_assets_department_id")
+        connection.exec_driver_sql("DROP INDEX ix_logs_timestamp")
+    assert "ix_assets_department_id" not in index_names("assets")
+
+    created = migrate_indexes(db.engine)
+    assert created == ["ix_assets_department_id", "ix_logs_timestamp"]
+    assert "ix_assets_department_id" in index_names("assets")
+    assert "ix_logs_timestamp" in index_names("logs")
+
+    assert migrate_indexes(db.engine) == []
+
+
+def test_migrate_replaces_obsolete_indexes(app, seed_assets):
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_users_username_prefix")
+        connection.exec_driver_sql(
+            "CREATE INDEX ix_users_username_lower ON users (lower(username))"
+        )
+
+    assert migrate_indexes(db.engine) == ["ix_users_username_prefix"]
+    indexes = {
+        name for (name,) in db.session.execute(text(
+            "SELECT name FROM sqlite_master WHERE tbl_name = 'users'"
+        ))
+    }
+    assert "ix_users_username_prefix" in indexes
+    assert "ix_users_username_lower" not in indexes
+
+
+def test_migrate_builds_search_index(app, seed_assets):
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE asset_search")
+
+    assert migrate_search_index(db.engine) is True
+    matches = Asset.query.filter(Asset.id.in_(asset_search_ids("windows")))
+    assert [asset.name for asset in matches] == ["Windows 10 PC"]
+
+    assert migrate_search_index(db.engine) is False
+
+
+def test_partitioned_index_built_per_partition(app):
+    index = next(
+        index for index in Log.__table__.indexes
+        if index.name == "ix_logs_timestamp"
+    )
+    statements = partitioned_index_statements(
+        index, ["logs_legacy", "logs_default"], postgresql.dialect()
+    )
+    assert statements == [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+        "logs_legacy_ix_logs_timestamp ON logs_legacy (timestamp)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+        "logs_default_ix_logs_timestamp ON logs_default (timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_logs_timestamp "
+        "ON ONLY logs (timestamp)",
+        "ALTER INDEX ix_logs_timestamp "
+        "ATTACH PARTITION logs_legacy_ix_logs_timestamp",
+        "ALTER INDEX ix_logs_timestamp "
+        "ATTACH PARTITION logs_default_ix_logs_timestamp",
+    ]
@@ -0,0 +1,44 @@
+from werkzeug.security import generate_password_hash
+from database import db
+from models import User
+from passwords import PasswordHasher, password_hasher, hash_prefix
+from utils import login_as_user
+
+
+def test_needs_rehash(app):
+    assert not password_hasher.needs_rehash(password_hasher.hash("secret"))
+    assert password_hasher.needs_rehash(
+        generate_password_hash("secret", "pbkdf2:sha256:1000")
+    )
+
+
+def test_hash_prefix_matches_werkzeug():
+    for method in ["scrypt", "scrypt:16384:8:1", "pbkdf2",
+                   "pbkdf2:sha512", "pbkdf2:sha256:1000"]:
+        assert hash_prefix(method) == generate_password_hash(
+            "", method
+        ).split("$", 1)[0]
+
+
+def test_login_rehashes_outdated_hash(client, seed_auth):
+    user = User.query.filter_by(username="user").first()
+    user.password_hash = generate_password_hash(
+        "password", "pbkdf2:sha256:1000"
+    )
+    db.session.commit()
+
+    login_as_user(client)
+    user = User.query.filter_by(username="user").first()
+    assert user.password_hash.startswith("scrypt:")
+    assert password_hasher.check(user.password_hash, "password")
+
+
+def test_process_pool_hashing(app):
+    hasher = PasswordHasher()
+    hasher.workers = 1
+    try:
+        password_hash = hasher.hash("secret")
+        assert hasher.check(password_hash, "secret")
+        assert not hasher.check(password_hash, "wrong")
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,71 @@
+import logging
+import pytest
+from database import db
+from models import Department
+from query_budget import fingerprint, query_tracker
+from utils import login_as_admin, login_as_user
+
+ENDPOINT_BUDGETS = [
+    ('/dashboard', 4),
+    ('/assets', 4),
+    ('/assets?q=laptop', 4),
+    ('/users/search?q=a', 2),
+    ('/departments/search?q=i', 2),
+    ('/users', 4),
+    ('/departments', 4),
+    ('/logs', 4),
+    ('/api/v1/assets', 3),
+    ('/api/v1/users', 3),
+]
+
+
+def test_fingerprint():
+    assert fingerprint(
+        "SELECT * FROM users\n  WHERE id = 42 AND name = 'it''s'"
+    ) == "SELECT * FROM users WHERE id = ? AND name = ?"
+    assert fingerprint("SELECT * FROM assets WHERE id IN (?, ?, ?)") == \
+        fingerprint("SELECT * FROM assets WHERE id IN (?)")
+    assert fingerprint(
+        "SELECT * FROM assets WHERE id IN (%(id_1_1)s, %(id_1_2)s)"
+    ) == "SELECT * FROM assets WHERE id IN (?)"
+
+
+@pytest.mark.parametrize('path, budget', ENDPOINT_BUDGETS)
+def test_admin_endpoint_query_budget(client, seed_assets, max_queries,
+                                     path, budget):
+    login_as_admin(client)
+    with max_queries(budget) as reports:
+        response = client.get(path)
+        response.get_data()
+    assert response.status_code == 200
+    assert reports
+
+
+@pytest.mark.parametrize('path, budget', ENDPOINT_BUDGETS)
+def test_user_endpoint_query_budget(client, seed_assets, max_queries,
+                                    path, budget):
+    login_as_user(client)
+    with max_queries(budget):
+        client.get(path).get_data()
+
+
+def test_warns_over_budget(client, seed_assets, monkeypatch, caplog):
+    login_as_admin(client)
+    monkeypatch.setitem(query_tracker.budgets, 'departments.departments', 1)
+    with caplog.at_level(logging.WARNING):
+        client.get('/departments')
+    assert "departments.departments ran" in caplog.text
+    assert "over its budget of 1" in caplog.text
+
+
+def test_warns_on_repeated_query(app, seed_assets, caplog):
+    with app.test_request_context('/departments'):
+        query_tracker._start()
+        for department_id in range(1, 11):
+            db.session.execute(
+                db.select(Department).filter_by(id=department_id)
+            ).all()
+        with caplog.at_level(logging.WARNING):
+            query_tracker._finish()
+    assert "ran the same query 10 times" in caplog.text
+    assert "FROM departments WHERE departments.id = ?" in caplog.text
@@ -0,0 +1,115 @@
+import pytest
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+from passwords import password_hasher
+from ratelimit import MemoryBucketStore, rate_limiter
+
+
+@pytest.fixture
+def limited():
+    rules = rate_limiter.rules
+    rate_limiter.enabled = True
+    rate_limiter.rules = {
+        "login_ip": (5, 60),
+        "login_username": (2, 60),
+        "register_ip": (1, 60),
+    }
+    rate_limiter.store.clear()
+    yield rate_limiter
+    rate_limiter.enabled = False
+    rate_limiter.rules = rules
+    rate_limiter.store.clear()
+
+
+def rejections(rule):
+    return REGISTRY.get_sample_value(
+        "itam_rate_limit_rejections_total", {"rule": rule}
+    ) or 0
+
+
+def test_bucket_refills():
+    store = MemoryBucketStore()
+    with patch("ratelimit.time.monotonic", return_value=100.0):
+        assert store.consume("key", 2, 1)
+        assert store.consume("key", 2, 1)
+        assert not store.consume("key", 2, 1)
+    with patch("ratelimit.time.monotonic", return_value=101.0):
+        assert store.consume("key", 2, 1)
+        assert not store.consume("key", 2, 1)
+
+
+def test_bucket_store_is_bounded():
+    store = MemoryBucketStore(max_keys=2)
+    for key in ("a", "b", "c"):
+        store.consume(key, 1, 1)
+    assert list(store._buckets) == ["b", "c"]
+
+
+def test_login_limited_per_username(client, seed_auth, limited):
+    for _ in range(2):
+        response = client.post('/login', data={
+            'username': 'user', 'password': 'wrong'
+        })
+        assert response.status_code == 200
+
+    before = rejections("login_username")
+    with patch.object(password_hasher, "check") as check:
+        response = client.post('/login', data={
+            'username': 'User', 'password': 'password'
+        })
+    assert response.status_code == 429
+    assert b"Too many attempts" in response.data
+    check.assert_not_called()
+    assert rejections("login_username") == before + 1
+
+    # other accounts from the same address are still admitted
+    response = client.post('/login', data={
+        'username': 'admin', 'password': 'password'
+    })
+    assert response.status_code == 302
+
+
+def test_login_limited_per_ip(client, seed_auth, limited):
+    for number in range(5):
+        client.post('/login', data={
+            'username': f'guess{number}', 'password': 'wrong'
+        })
+    before = rejections("login_ip")
+    response = client.post('/login', data={
+        'username': 'admin', 'password': 'password'
+    })
+    assert response.status_code == 429
+    assert rejections("login_ip") == before + 1
+
+
+def test_login_limited_per_forwarded_ip(client, seed_auth, limited):
+    for number in range(5):
+        client.post('/login', data={
+            'username': f'guess{number}', 'password': 'wrong'
+        }, headers={'X-Forwarded-For': '203.0.113.7'})
+
+    # clients behind the same proxy keep their own buckets
+    response = client.post('/login', data={
+        'username': 'admin', 'password': 'password'
+    }, headers={'X-Forwarded-For': '203.0.113.8'})
+    assert response.status_code == 302
+    response = client.post('/login', data={
+        'username': 'admin', 'password': 'password'
+    }, headers={'X-Forwarded-For': '203.0.113.7'})
+    assert response.status_code == 429
+
+
+def test_register_limited_per_ip(client, seed_auth, limited):
+    response = client.post('/register', data={
+        'username': 'first', 'password': 'password'
+    })
+    assert response.status_code == 302
+
+    before = rejections("register_ip")
+    with patch.object(password_hasher, "hash") as hash_password:
+        response = client.post('/register', data={
+            'username': 'second', 'password': 'password'
+        })
+    assert response.status_code == 429
+    hash_password.assert_not_called()
+    assert rejections("register_ip") == before + 1
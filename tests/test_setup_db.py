@@ -0,0 +1,55 @@
+from datetime import datetime
+from sqlalchemy import func
+from database import db
+from models import User, Department, Asset, Log
+from setup_db import generate_data, DEPARTMENT_NAMES
+
+
+def generate(seed):
+    db.drop_all()
+    db.create_all()
+    generate_data(
+        users=50, assets=200, logs=1000, seed=seed,
+        until=datetime(2025, 1, 1), batch_size=64
+    )
+    return [
+        (asset.name, asset.owner_id, asset.date_created)
+        for asset in Asset.query.order_by(Asset.id)
+    ]
+
+
+def test_generate_data(app):
+    assets = generate(seed=7)
+
+    assert User.query.count() == 50
+    assert Department.query.count() == len(DEPARTMENT_NAMES)
+    assert len(assets) == 200
+    assert Log.query.count() == 1000
+    assert db.session.get(User, 1).username == "admin"
+    assert db.session.get(User, 1).role == "Admin"
+
+    # every foreign key points at a generated row
+    assert not Asset.query.filter(
+        (Asset.owner_id > 50) | (Asset.department_id > len(DEPARTMENT_NAMES))
+    ).count()
+    assert db.session.query(func.max(Log.user_id)).scalar() <= 50
+    assert db.session.query(func.max(Log.timestamp)).scalar() < \
+        datetime(2025, 1, 1)
+
+    # logs are written oldest first and their indexes are rebuilt
+    timestamps = [log.timestamp for log in Log.query.order_by(Log.id)]
+    assert timestamps == sorted(timestamps)
+    indexes = {index["name"] for index in db.inspect(db.engine)
+               .get_indexes("logs")}
+    assert {"ix_logs_timestamp", "ix_logs_user_id_timestamp"} <= indexes
+
+    db.session.remove()
+
+
+def test_generate_data_is_deterministic(app):
+    first = generate(seed=3)
+    db.session.remove()
+    assert generate(seed=3) == first
+    db.session.remove()
+    assert generate(seed=4) != first
+    db.session.remove()
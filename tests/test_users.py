@@ -1,5 +1,7 @@
+from sqlalchemy.dialects import postgresql
 from utils import login_as_admin
-from models import Log
+from models import Log, User
+from routes.utils import prefix_filter
 
 
 def test_users_page_loads(client, seed_users):
@@ -87,3 +89,55 @@ def test_edit_user_form_access(client, seed_users):
     login_as_admin(client)
     response = client.get("/users")
     assert b"Edit" in response.data
+
+
+def test_user_search(client, seed_users):
+    login_as_admin(client)
+    response = client.get('/users/search?q=AD')
+    assert response.get_json()["results"] == [{"id": 1, "username": "admin"}]
+    usernames = [
+        match["username"]
+        for match in client.get('/users/search?q=n').get_json()["results"]
+    ]
+    assert usernames == ["new_user"]
+
+
+def test_user_search_through_underscore(client, seed_users):
+    login_as_admin(client)
+    results = client.get('/users/search?q=NEW_').get_json()["results"]
+    assert [match["username"] for match in results] == ["new_user"]
+
+
+def test_prefix_filter_compares_by_code_point():
+    # Postgres locale collations don't order '_' where its code point is
+    statement = str(prefix_filter(User.username, "new_").compile(
+        dialect=postgresql.dialect()
+    ))
+    assert statement.count('lower(users.username) COLLATE "C"') == 3
+
+
+def test_user_search_scoped_to_self(client, seed_users):
+    client.post('/login', data={
+        'username': 'new_user',
+        'password': 'password'
+    })
+    assert client.get('/users/search?q=a').get_json() == {"results": []}
+    results = client.get('/users/search?q=new').get_json()["results"]
+    assert [match["username"] for match in results] == ["new_user"]
+
+
+def test_user_directory_invalidated_by_routes(client, seed_users):
+    login_as_admin(client)
+    client.get("/users")
+    client.post("/user/create", data={
+        "username": "directory_user",
+        "password": "password",
+        "role": "User"
+    })
+    response = client.get("/users")
+    assert b"directory_user" in response.data
+    results = client.get("/users/search?q=dir").get_json()["results"]
+    assert [match["username"] for match in results] == ["directory_user"]
+
+    client.post(f"/user/delete/{results[0]['id']}")
+    assert b"directory_user" not in client.get("/users").data
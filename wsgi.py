@@ -0,0 +1,5 @@
+from app import create_app
+
+# the one application object production servers import, built once in
+# the gunicorn master when preload_app is on and shared with the workers
+app = create_app()